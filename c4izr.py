@@ -4,9 +4,13 @@
 
 
 
-import xml.etree.ElementTree as ET
+from lxml import etree as ET
 
-import uuid
+import io
+
+import re
+
+import itertools
 
 import sys
 
@@ -14,6 +18,89 @@ import logging
 
 
 
+# C4 styles and label templates shared by every converted cell
+_MAIN_STYLE = "rounded=1;whiteSpace=wrap;html=1;labelBackgroundColor=none;fillColor=#1061B0;fontColor=#ffffff;align=center;arcSize=10;strokeColor=#0D5091;metaEdit=1;resizable=0;points=[[0.25,0,0],[0.5,0,0],[0.75,0,0],[1,0.25,0],[1,0.5,0],[1,0.75,0],[0.75,1,0],[0.5,1,0],[0.25,1,0],[0,0.75,0],[0,0.5,0],[0,0.25,0]];"
+
+_OTHER_STYLE = "rounded=1;whiteSpace=wrap;html=1;labelBackgroundColor=none;fillColor=#8C8496;fontColor=#ffffff;align=center;arcSize=10;strokeColor=#736782;metaEdit=1;resizable=0;points=[[0.25,0,0],[0.5,0,0],[0.75,0,0],[1,0.25,0],[1,0.5,0],[1,0.75,0],[0.75,1,0],[0.5,1,0],[0.25,1,0],[0,0.75,0],[0,0.5,0],[0,0.25,0]];"
+
+# Indexed by "is this the main system"
+_STYLES = (_OTHER_STYLE, _MAIN_STYLE)
+
+_VERTEX_LABEL = ('<font style="font-size: 16px"><b>%c4Name%</b></font>'
+                 '<div>[%c4Type%]</div><br>'
+                 '<div><font style="font-size: 11px">'
+                 '<font color="#cccccc">%c4Description%</font></div>')
+
+_VERTEX_DESCRIPTION = "Description of {}.".format
+
+_EDGE_STYLE = "endArrow=blockThin;html=1;fontSize=10;fontColor=#404040;strokeWidth=1;endFill=1;strokeColor=#828282;elbow=vertical;metaEdit=1;endSize=14;startSize=14;jumpStyle=arc;jumpSize=16;rounded=0;edgeStyle=orthogonalEdgeStyle;"
+
+_EDGE_LABEL = ('<div style="text-align: left">'
+               '<div style="text-align: center"><b>%c4Description%</b></div>'
+               '<div style="text-align: center">[%c4Technology%]</div></div>')
+
+
+
+# Matches an exit*/entry* style token together with its trailing separator
+_EXIT_ENTRY_RE = re.compile(r'(?:^|(?<=;))(?:exit|entry)[^;]*(?:;|$)')
+
+# Drops ignorable whitespace so lxml can re-indent the tree when pretty printing
+_PRETTY_PARSER = ET.XMLParser(remove_blank_text=True, resolve_entities=False, no_network=True)
+
+
+
+def _format_coordinate(value):
+
+    """Format a pixel coordinate with at most two decimals (263.00000000000006 -> '263')."""
+
+    formatted = f"{value:.2f}".rstrip('0').rstrip('.')
+
+    return '0' if formatted == '-0' else formatted
+
+
+
+def _fallback_ids(used_ids):
+
+    """Yield cheap sequential ids for cells without one, skipping ids already in the input."""
+
+    for n in itertools.count():
+
+        candidate = f"c4-{n}"
+
+        if candidate not in used_ids:
+
+            yield candidate
+
+
+
+def _to_float(value):
+
+    """Parse a geometry attribute, returning None when it is not a number."""
+
+    try:
+
+        return float(value)
+
+    except (ValueError, TypeError):
+
+        return None
+
+
+
+def _translate_one(job):
+
+    """Translate a single diagram in a worker process (used by translate_multiple)."""
+
+    scaling_factor, input_xml = job
+
+    translator = c4izr(scaling_factor=scaling_factor)
+
+    translator.interactive = False
+
+    return translator.translate(input_xml)
+
+
+
 class c4izr:
 
     def __init__(self, scaling_factor=1.4):
@@ -26,17 +113,19 @@ class c4izr:
 
         
 
-        # Configure logging
+        # Configure logging once; the logger is shared by every translator instance
 
-        handler = logging.StreamHandler(sys.stdout)
+        if not self.logger.handlers:
 
-        formatter = logging.Formatter('%(levelname)s - %(message)s')
+            handler = logging.StreamHandler(sys.stdout)
 
-        handler.setFormatter(formatter)
+            formatter = logging.Formatter('%(levelname)s - %(message)s')
 
-        self.logger.addHandler(handler)
+            handler.setFormatter(formatter)
 
-        self.logger.setLevel(logging.INFO)
+            self.logger.addHandler(handler)
+
+            self.logger.setLevel(logging.INFO)
 
 
 
@@ -45,72 +134,106 @@ class c4izr:
         Translate a draw.io XML string to C4 format.
         
         Args:
-            input_xml (str): XML string from draw.io
+            input_xml (str or bytes): XML from draw.io; bytes must be UTF-8 encoded
             
         Returns:
             str: Translated XML in C4 format
         """
+        # Stream the input once: classify cells as they close, read each vertex
+        # geometry into parallel coordinate lists while tracking the diagram
+        # bounds, and detach the cell so the source tree never keeps growing
+        vertices = []
+        edges = []
+        used_ids = set()
+        raw_xs, raw_ys, xs, ys = [], [], [], []
+        min_x = min_y = float('inf')
+        max_x = max_y = float('-inf')
+        if isinstance(input_xml, str):
+            input_xml = input_xml.encode()
         try:
-            input_tree = ET.ElementTree(ET.fromstring(input_xml))
-            input_root = input_tree.getroot()
-        except ET.ParseError as e:
+            context = ET.iterparse(io.BytesIO(input_xml), events=('end',), tag='mxCell',
+                                   resolve_entities=False, no_network=True)
+            for _, mxcell in context:
+                parent = mxcell.getparent()
+                used_ids.add(mxcell.get('id'))
+                if parent is not None and parent.tag != 'root':
+                    # Ids of <object> wrappers around cells
+                    used_ids.add(parent.get('id'))
+                if mxcell.get('vertex') == '1':
+                    vertices.append(mxcell)
+                    mxgeometry = mxcell.find('mxGeometry')
+                    attrib = mxgeometry.attrib if mxgeometry is not None else {}
+                    raw_x = attrib.get("x")
+                    raw_y = attrib.get("y")
+                    raw_xs.append(raw_x)
+                    raw_ys.append(raw_y)
+                    x = 0.0 if raw_x is None else _to_float(raw_x)
+                    y = 0.0 if raw_y is None else _to_float(raw_y)
+                    xs.append(x)
+                    ys.append(y)
+                    if mxgeometry is not None:
+                        width = _to_float(attrib.get("width", 0))
+                        height = _to_float(attrib.get("height", 0))
+                        if x is None or y is None or width is None or height is None:
+                            self.logger.warning(f"Invalid geometry value for element {mxcell.get('id')}")
+                        else:
+                            if x < min_x:
+                                min_x = x
+                            if y < min_y:
+                                min_y = y
+                            if x + width > max_x:
+                                max_x = x + width
+                            if y + height > max_y:
+                                max_y = y + height
+                elif mxcell.get('edge') == '1':
+                    edges.append(mxcell)
+                else:
+                    mxcell.clear()
+                if parent is not None:
+                    parent.remove(mxcell)
+            input_root = context.root
+        except (ET.ParseError, ET.XMLSyntaxError) as e:
             self.logger.error(f"Failed to parse input XML: {e}")
             raise ValueError(f"Invalid XML format: {e}")
 
-        output_root = ET.Element("mxGraphModel", input_root.attrib)
+        output_root = ET.Element("mxGraphModel", dict(input_root.attrib))
         new_root = ET.SubElement(output_root, "root")
 
         # Add the required <mxCell> elements at the top
         ET.SubElement(new_root, "mxCell", id="0")
         ET.SubElement(new_root, "mxCell", id="1", parent="0")
 
-        existing_ids = {elem.get('id') for elem in input_root.findall('.//mxCell')}
-
-        # Calculate the center of the diagram
-        min_x = min_y = float('inf')
-        max_x = max_y = float('-inf')
-        
-        # Find all boxes (vertices) in the diagram
-        vertices = input_root.findall('.//mxCell[@vertex="1"]')
         if not vertices:
             self.logger.warning("No elements found in the diagram")
-            return ET.tostring(output_root, encoding='unicode', method='xml')
-            
-        for mxcell in vertices:
-            mxgeometry = mxcell.find('mxGeometry')
-            if mxgeometry is not None:
-                try:
-                    x = float(mxgeometry.get("x", 0))
-                    y = float(mxgeometry.get("y", 0))
-                    width = float(mxgeometry.get("width", 0))
-                    height = float(mxgeometry.get("height", 0))
-                    
-                    min_x = min(min_x, x)
-                    min_y = min(min_y, y)
-                    max_x = max(max_x, x + width)
-                    max_y = max(max_y, y + height)
-                except (ValueError, TypeError) as e:
-                    self.logger.warning(f"Invalid geometry value for element {mxcell.get('id')}: {e}")
+            return ET.tostring(output_root, encoding='unicode')
 
         # Ensure we have valid bounds
-        if min_x == float('inf') or min_y == float('inf') or max_x == float('-inf') or max_y == float('-inf'):
+        if min_x == float('inf'):
             self.logger.warning("Could not determine diagram bounds, using defaults")
             min_x = min_y = 0
             max_x = max_y = 500
-            
+
         center_x = (min_x + max_x) / 2
         center_y = (min_y + max_y) / 2
 
+        # Scale all positions away from the center in one batch; coordinates
+        # that are not numbers are carried over unchanged. Draw.io positions
+        # are pixels, so two decimals keep the output compact
+        factor = self.scaling_factor
+        scaled_xs = [raw if raw is None or x is None else _format_coordinate(center_x + (x - center_x) * factor)
+                     for raw, x in zip(raw_xs, xs)]
+        scaled_ys = [raw if raw is None or y is None else _format_coordinate(center_y + (y - center_y) * factor)
+                     for raw, y in zip(raw_ys, ys)]
+
         # Select main system
         system = None
         if self.interactive:
             self.logger.info(f"Center of the diagram: ({center_x}, {center_y})")
             self.logger.info(f"Found:")
 
-            for ix, mxcell in enumerate(vertices, 1):
-                cell_value = mxcell.get('value', '')
-                system = cell_value if system is None else system
-                self.logger.info(f" {ix}. {cell_value}")
+            if self.logger.isEnabledFor(logging.INFO):
+                for ix, mxcell in enumerate(vertices, 1):
+                    self.logger.info(f" {ix}. {mxcell.get('value', '')}")
 
             def has_duplicates(input_list):
                 return len(input_list) != len(set(input_list))
@@ -146,19 +269,27 @@ class c4izr:
             system = vertices[0].get('value', '')
             self.logger.info(f"Non-interactive mode: automatically selected {system} as main system")
 
+        # Mark the main system(s) up front so emitting a vertex is a plain style lookup
+        main_flags = [mxcell.get("value") == system for mxcell in vertices]
+
+        fallback_ids = _fallback_ids(used_ids)
+
         # Process all vertices (elements with vertex="1")
-        for mxcell in vertices:
-            self._process_vertex(mxcell, new_root, system, center_x, center_y)
+        for mxcell, is_main, x_new, y_new in zip(vertices, main_flags, scaled_xs, scaled_ys):
+            self._process_vertex(mxcell, new_root, is_main, x_new, y_new, fallback_ids)
 
         # Process all edges (elements with edge="1")
-        for mxcell in input_root.findall('.//mxCell[@edge="1"]'):
-            self._process_edge(mxcell, new_root)
+        for mxcell in edges:
+            self._process_edge(mxcell, new_root, fallback_ids)
 
-        return ET.tostring(output_root, encoding='unicode', method='xml')
+        return ET.tostring(output_root, encoding='unicode')
 
     def translate_multiple(self, input_xml_list):
         """
         Translate multiple draw.io XML strings to C4 format.
+
+        In non-interactive mode the diagrams are translated in parallel
+        worker processes.
         
         Args:
             input_xml_list (list): List of XML strings from draw.io
@@ -166,55 +297,47 @@ class c4izr:
         Returns:
             list: List of translated XML strings in C4 format
         """
-        return [self.translate(input_xml) for input_xml in input_xml_list]
-
-
+        # Interactive runs prompt for each diagram, so only batch runs fan out
+        if self.interactive or len(input_xml_list) < 2:
+            return [self.translate(input_xml) for input_xml in input_xml_list]
 
-    def _process_vertex(self, mxcell, new_root, system, center_x, center_y):
+        from concurrent.futures import ProcessPoolExecutor
 
-        """Process a vertex element and add it to the new root."""
-
-        try:
-
-            object_elem = ET.SubElement(new_root, "object")
+        with ProcessPoolExecutor() as executor:
+            jobs = [(self.scaling_factor, input_xml) for input_xml in input_xml_list]
+            return list(executor.map(_translate_one, jobs))
 
-            object_elem.set("id", mxcell.attrib.get("id", str(uuid.uuid4())))
 
 
+    def _process_vertex(self, mxcell, new_root, is_main, x_new, y_new, fallback_ids):
 
-            object_elem.set("placeholders", "1")
-
-            object_elem.set("c4Name", mxcell.get("value", ""))
-
-            object_elem.set("c4Type", "Software System")
+        """Process a vertex element and add it to the new root."""
 
-            object_elem.set("c4Description", f"Description of {mxcell.get('value', '').lower()}.")
+        try:
 
+            name = mxcell.get("value", "")
 
+            object_elem = ET.SubElement(new_root, "object", {
 
-            label = ('<font style="font-size: 16px"><b>%c4Name%</b></font>'
+                "id": mxcell.get("id") or next(fallback_ids),
 
-                    '<div>[%c4Type%]</div><br>'
+                "placeholders": "1",
 
-                    '<div><font style="font-size: 11px">'
+                "c4Name": name,
 
-                    '<font color="#cccccc">%c4Description%</font></div>')
+                "c4Type": "Software System",
 
+                "c4Description": _VERTEX_DESCRIPTION(name.lower()),
 
+                "label": _VERTEX_LABEL
 
-            object_elem.set("label", label)
+            })
 
 
 
             # Apply C4 style based on whether this is the main system
 
-            if mxcell.get("value") == system:
-
-                style = "rounded=1;whiteSpace=wrap;html=1;labelBackgroundColor=none;fillColor=#1061B0;fontColor=#ffffff;align=center;arcSize=10;strokeColor=#0D5091;metaEdit=1;resizable=0;points=[[0.25,0,0],[0.5,0,0],[0.75,0,0],[1,0.25,0],[1,0.5,0],[1,0.75,0],[0.75,1,0],[0.5,1,0],[0.25,1,0],[0,0.75,0],[0,0.5,0],[0,0.25,0]];"
-
-            else:
-
-                style = "rounded=1;whiteSpace=wrap;html=1;labelBackgroundColor=none;fillColor=#8C8496;fontColor=#ffffff;align=center;arcSize=10;strokeColor=#736782;metaEdit=1;resizable=0;points=[[0.25,0,0],[0.5,0,0],[0.75,0,0],[1,0.25,0],[1,0.5,0],[1,0.75,0],[0.75,1,0],[0.5,1,0],[0.25,1,0],[0,0.75,0],[0,0.5,0],[0,0.25,0]];"
+            style = _STYLES[is_main]
 
 
 
@@ -236,73 +359,35 @@ class c4izr:
 
             if mxgeometry is not None:
 
-                # Create a new geometry element
-
-                new_geometry = ET.Element('mxGeometry')
-
-                
-
                 # Standard C4 box dimensions
 
-                new_geometry.set("width", "240")
-
-                new_geometry.set("height", "120")
-
-                
-
-                # Apply scaling relative to center
-
-                if mxgeometry.get("x") is not None:
-
-                    try:
-
-                        x = float(mxgeometry.get("x"))
-
-                        dx = x - center_x
-
-                        x_new = center_x + dx * self.scaling_factor
-
-                        new_geometry.set("x", str(x_new))
-
-                    except (ValueError, TypeError):
-
-                        new_geometry.set("x", mxgeometry.get("x"))
-
-                        self.logger.warning(f"Could not scale x coordinate for element {mxcell.get('id')}")
+                attrs = {"width": "240", "height": "120"}
 
-                
 
-                if mxgeometry.get("y") is not None:
 
-                    try:
-
-                        y = float(mxgeometry.get("y"))
+                # Positions were already scaled relative to the center by translate
 
-                        dy = y - center_y
+                if x_new is not None:
 
-                        y_new = center_y + dy * self.scaling_factor
+                    attrs["x"] = x_new
 
-                        new_geometry.set("y", str(y_new))
+                if y_new is not None:
 
-                    except (ValueError, TypeError):
+                    attrs["y"] = y_new
 
-                        new_geometry.set("y", mxgeometry.get("y"))
 
-                        self.logger.warning(f"Could not scale y coordinate for element {mxcell.get('id')}")
-
-                
 
                 # Copy any other relevant attributes
 
-                for attr in mxgeometry.attrib:
+                for attr, value in mxgeometry.attrib.items():
+
+                    if attr not in ('x', 'y', 'width', 'height'):
 
-                    if attr not in ['x', 'y', 'width', 'height']:
+                        attrs[attr] = value
 
-                        new_geometry.set(attr, mxgeometry.get(attr))
 
-                
 
-                object_mxcell.append(new_geometry)
+                ET.SubElement(object_mxcell, "mxGeometry", attrs)
 
         except Exception as e:
 
@@ -312,7 +397,7 @@ class c4izr:
 
 
 
-    def _process_edge(self, mxcell, new_root):
+    def _process_edge(self, mxcell, new_root, fallback_ids):
 
         """Process an edge element and add it to the new root."""
 
@@ -330,39 +415,23 @@ class c4izr:
 
 
 
-            object_elem = ET.SubElement(new_root, "object")
-
-            object_elem.set("id", mxcell.attrib.get('id', str(uuid.uuid4())))
-
-
+            object_elem = ET.SubElement(new_root, "object", {
 
-            object_elem.set("placeholders", "1")
+                "id": mxcell.get("id") or next(fallback_ids),
 
-            object_elem.set("c4Type", "Relationship")
+                "placeholders": "1",
 
-            object_elem.set("c4Technology", "e.g. JSON/HTTP")
+                "c4Type": "Relationship",
 
-            object_elem.set("c4Description", "e.g. Makes API calls")
+                "c4Technology": "e.g. JSON/HTTP",
 
-            
-
-            # Use the edge label if available
-
-            if 'value' in mxcell.attrib and mxcell.get('value'):
-
-                object_elem.set("c4Description", mxcell.get('value'))
-
-
-
-            label = ('<div style="text-align: left">'
+                # Use the edge label if available
 
-                    '<div style="text-align: center"><b>%c4Description%</b></div>'
+                "c4Description": mxcell.get("value") or "e.g. Makes API calls",
 
-                    '<div style="text-align: center">[%c4Technology%]</div></div>')
+                "label": _EDGE_LABEL
 
-
-
-            object_elem.set("label", label)
+            })
 
 
 
@@ -370,7 +439,7 @@ class c4izr:
 
             object_mxcell = ET.SubElement(object_elem, "mxCell", {
 
-                "style": "endArrow=blockThin;html=1;fontSize=10;fontColor=#404040;strokeWidth=1;endFill=1;strokeColor=#828282;elbow=vertical;metaEdit=1;endSize=14;startSize=14;jumpStyle=arc;jumpSize=16;rounded=0;edgeStyle=orthogonalEdgeStyle;",
+                "style": _EDGE_STYLE,
 
                 "edge": "1",
 
@@ -398,23 +467,25 @@ class c4izr:
 
 
 
-    def pretty_print(self, xml_string):
+    def pretty_print(self, xml):
 
-        """Format XML string with proper indentation for better readability."""
+        """Format XML with proper indentation for better readability.
 
-        try:
+        Accepts either an XML string or an already parsed lxml element; the
+        latter is serialized directly without a parse round-trip.
+        """
 
-            import xml.dom.minidom
+        try:
 
-            dom = xml.dom.minidom.parseString(xml_string)
+            root = ET.fromstring(xml.encode(), _PRETTY_PARSER) if isinstance(xml, str) else xml
 
-            return '\n'.join([line for line in dom.toprettyxml(indent="  ").split('\n') if line.strip() and not line.startswith('<?xml')])
+            return ET.tostring(root, encoding='unicode', pretty_print=True).rstrip('\n')
 
         except Exception as e:
 
             self.logger.error(f"Error formatting XML: {e}")
 
-            return xml_string
+            return xml
 
 
 
@@ -426,11 +497,9 @@ class c4izr:
 
         try:
 
-            elements = input_string.split(';')
-
-            filtered_elements = [elem for elem in elements if not elem.startswith('exit') and not elem.startswith('entry')]
+            filtered = _EXIT_ENTRY_RE.sub('', input_string)
 
-            return ';'.join(filtered_elements) + ';'
+            return filtered if filtered.endswith(';') else filtered + ';'
 
         except Exception as e:
 
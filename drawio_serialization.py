@@ -1,6 +1,7 @@
 import base64
 import zlib
 from urllib.parse import quote, unquote
+from lxml import etree
 
 
 # functions courtesy of
@@ -44,6 +45,11 @@ def decode_diagram_data(data):
     return data
 
 def encode_diagram_data(data):
+    # data may be an XML string, UTF-8 bytes (as DiagramToDrawIO.convert returns)
+    # or an lxml element; elements are serialized straight to bytes, which
+    # quote() accepts without a str round-trip
+    if isinstance(data, etree._Element):
+        data = etree.tostring(data, encoding='utf-8', xml_declaration=False)
     # https://stackoverflow.com/questions/33547976/using-python-quote-plus-with-slashes
     data = quote(data, safe='~()*!.\'')
     data = data.encode()
@@ -2,12 +2,21 @@ from lxml import etree
 import secrets
 import string
 import drawio_serialization
-import xml.dom.minidom
 from datetime import datetime, timezone
+from functools import lru_cache
 import os
 
-def id_generator(size=22, chars=string.ascii_uppercase + string.digits + string.ascii_lowercase + '-_'):
+_ID_CHARS = string.ascii_uppercase + string.digits + string.ascii_lowercase + '-_'
+
+# The default alphabet has exactly 64 symbols, so the low 6 bits of each random
+# byte select a character without modulo bias
+_ID_TRANSLATION = bytes(_ID_CHARS.encode('ascii')[b & 0x3F] for b in range(256))
+
+
+def id_generator(size=22, chars=_ID_CHARS):
     """Generate a cryptographically secure random ID."""
+    if chars == _ID_CHARS:
+        return secrets.token_bytes(size).translate(_ID_TRANSLATION).decode('ascii')
     return ''.join(secrets.choice(chars) for _ in range(size))
 
 def create_layer(name, locked=0):
@@ -18,38 +27,23 @@ def create_layer(name, locked=0):
     mxcell.set('parent', '0')
     return mxcell
 
+_MXGRAPH_ATTRS = {
+    'dx': '981', 'dy': '650', 'grid': '1', 'gridSize': '10', 'guides': '1',
+    'tooltips': '1', 'connect': '1', 'arrows': '1', 'fold': '1', 'page': '1',
+    'pageScale': '1', 'pageWidth': '816', 'pageHeight': '1056', 'math': '0',
+    'shadow': '0',
+}
+
+_BACKGROUND_ATTRS = {'id': '1', 'style': 'locked=1', 'parent': '0', 'visible': '1', 'value': 'Background'}
+
+
 def get_diagram_root():
-    mxGraphModel = etree.Element('mxGraphModel')
-    mxGraphModel.set('dx', '981')
-    mxGraphModel.set('dy', '650')
-    mxGraphModel.set('grid', '1')
-    mxGraphModel.set('gridSize', '10')
-    mxGraphModel.set('guides', '1')
-    mxGraphModel.set('tooltips', '1')
-    mxGraphModel.set('connect', '1')
-    mxGraphModel.set('arrows', '1')
-    mxGraphModel.set('fold', '1')
-    mxGraphModel.set('page', '1')
-    mxGraphModel.set('pageScale', '1')
-    mxGraphModel.set('pageWidth', '816')
-    mxGraphModel.set('pageHeight', '1056')
-    mxGraphModel.set('math', '0')
-    mxGraphModel.set('shadow', '0')
-
-    root = etree.Element('root')
-    mxGraphModel.append(root)
+    mxGraphModel = etree.Element('mxGraphModel', _MXGRAPH_ATTRS)
+    root = etree.SubElement(mxGraphModel, 'root')
     # to cell is always there all the other layers inherit from it
-    mxcell = etree.Element('mxCell')
-    mxcell.set('id', '0')
-    root.append(mxcell)
+    etree.SubElement(root, 'mxCell', {'id': '0'})
     # background layer is always there, we don't draw on it
-    background = etree.Element('mxCell')
-    background.set('id', '1')
-    background.set('style', 'locked=1')
-    background.set('parent', '0')
-    background.set('visible', '1')
-    background.set('value', 'Background')
-    root.append(background)
+    etree.SubElement(root, 'mxCell', _BACKGROUND_ATTRS)
     return mxGraphModel
 
 
@@ -65,6 +59,11 @@ def sanitize_filename(filename):
     return basename
 
 
+def _utc_timestamp():
+    """Current UTC time in the format draw.io uses for the mxfile 'modified' attribute."""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
 def write_drawio_output(data, filename='output.drawio', output_dir=None):
     """
     Write diagram data to a drawio file.
@@ -78,8 +77,7 @@ def write_drawio_output(data, filename='output.drawio', output_dir=None):
     # If it looks like a path with directory, validate it
     if os.path.dirname(filename):
         # It's a path - resolve it and ensure it's within allowed scope
-        resolved_path = os.path.realpath(filename)
-        filename = resolved_path
+        filename = os.path.realpath(filename)
     else:
         # Just a filename - sanitize it
         filename = sanitize_filename(filename)
@@ -89,7 +87,7 @@ def write_drawio_output(data, filename='output.drawio', output_dir=None):
     root = etree.Element('mxfile')
     root.set('host', 'c4izr')
     # Use dynamic timestamp
-    root.set('modified', datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z')
+    root.set('modified', _utc_timestamp())
     root.set('agent', 'c4izr Python converter')
     root.set('etag', id_generator(20))
     root.set('version', '1.0.0')
@@ -107,15 +105,12 @@ def write_drawio_output(data, filename='output.drawio', output_dir=None):
 
 
 def encode_and_save_to_file(mxGraphModel, filename='output.drawio'):
-    data = etree.tostring(mxGraphModel, pretty_print=False)
-    data = drawio_serialization.encode_diagram_data(data)
+    data = drawio_serialization.encode_diagram_data(mxGraphModel)
     write_drawio_output(data, filename)
 
 
 def pretty_print_to_console(mxGraphModel):
-    dom = xml.dom.minidom.parseString(etree.tostring(mxGraphModel))
-    pretty_xml_as_string = dom.toprettyxml()
-    print(pretty_xml_as_string)
+    print(etree.tostring(mxGraphModel, pretty_print=True, encoding='unicode'))
 
 
 # id_generator_2 removed - use id_generator instead (duplicate function)
@@ -127,20 +122,23 @@ def layer_id_2(root, name):
             return node.get('id')
     raise RuntimeError('Layer ' + name + ' not found')
 
-def truncate_string_to_label_width(string, font_size, max_length):
-    # Base case: At font size 12, 30 characters fit in 220 pixels
-    base_font_size = 12
-    base_chars = 30
-    base_width = 220
+# Label fitting heuristic: at font size 12, 30 characters fit in 220 pixels
+_BASE_FONT_SIZE = 12
+_BASE_CHARS = 30
+_BASE_WIDTH = 220
 
+_AVG_CHAR_WIDTH_BASE = _BASE_WIDTH / _BASE_CHARS
 
-    char_width_at_base = base_width / base_chars
 
+@lru_cache(maxsize=256)
+def _char_width_at_font_size(font_size):
     # Extrapolate character width for the given font size
-    char_width_at_font_size = char_width_at_base * (base_font_size / font_size)
+    return _AVG_CHAR_WIDTH_BASE * (_BASE_FONT_SIZE / font_size)
+
 
+def truncate_string_to_label_width(string, font_size, max_length):
     # Calculate how many characters of the given font size fit into max_length
-    chars_fit = max_length / char_width_at_font_size
+    chars_fit = max_length / _char_width_at_font_size(font_size)
 
     # Truncate the string to the number of characters that can fit
     truncated_string = string[:int(chars_fit)]
@@ -148,15 +146,8 @@ def truncate_string_to_label_width(string, font_size, max_length):
     return truncated_string
 
 def resize_string_to_fit(string, initial_font_size, target_width):
-    base_font_size = 12
-    base_chars = 30
-    base_width = 220
-
-    # Calculate the average character width for the base case
-    avg_char_width_base = base_width / base_chars
-
     # Calculate the total width of the string at the initial font size
-    current_total_width = len(string) * avg_char_width_base * (initial_font_size / base_font_size)
+    current_total_width = len(string) * _AVG_CHAR_WIDTH_BASE * (initial_font_size / _BASE_FONT_SIZE)
 
     if current_total_width <= target_width:
         # If the string already fits within the target width at the initial font size,
@@ -164,7 +155,7 @@ def resize_string_to_fit(string, initial_font_size, target_width):
         return initial_font_size, string
     else:
         # Calculate the font size needed to make the string fit within the target width
-        adjusted_font_size = (target_width / len(string)) / avg_char_width_base * base_font_size
+        adjusted_font_size = (target_width / len(string)) / _AVG_CHAR_WIDTH_BASE * _BASE_FONT_SIZE
 
         # Assuming we want to maintain a minimum legible font size (e.g., 8px)
         min_font_size = 8
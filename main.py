@@ -4,12 +4,17 @@ C4izr main entry point - Converts draw.io diagrams to C4 model format.
 """
 
 import argparse
+import asyncio
+import collections
+import hashlib
 import os
 import sys
 import subprocess
 import logging
 import shutil
 import platform
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
 from c4izr import c4izr
@@ -54,6 +59,12 @@ def validate_drawio_path(path):
 
     return resolved
 
+# Image formats accepted for vision-based conversion
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.webp'}
+
+# Attribute carried by every C4 object; without it a diagram cannot already be converted
+_C4_MARKER_RE = re.compile(r'\sc4Type=')
+
 # Configure logging
 logger = logging.getLogger('c4izr')
 handler = logging.StreamHandler(sys.stdout)
@@ -105,13 +116,18 @@ def parse_arguments():
     parser.add_argument(
         "--from-image",
         action="store_true",
-        help="Input is a PNG/JPG image (uses vision AI to extract diagram structure)"
+        help="Input is a PNG/JPG image, or a directory of images (uses vision AI to extract diagram structure)"
     )
     parser.add_argument(
         "--model",
         help="Claude model to use for vision analysis (default: claude-opus-4-5-20251101)",
         default="claude-opus-4-5-20251101"
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Analyze images afresh instead of reusing cached vision results"
+    )
     parser.add_argument(
         "--save-intermediate",
         action="store_true",
@@ -120,22 +136,30 @@ def parse_arguments():
 
     return parser.parse_args()
 
-def process_image_file(image_path, output_path, args):
-    """Process an image file using vision AI to extract diagram structure."""
+def process_image_file(image_path, output_path, args, diagram_data=None):
+    """
+    Process an image file using vision AI to extract diagram structure.
+
+    diagram_data may be passed in when the image was already analyzed (as
+    process_image_directory does), which skips the vision call.
+    """
     try:
         # Import here to avoid dependency if not using vision features
-        from vision_diagram_parser import VisionDiagramParser
         from png2drawio import DiagramToDrawIO
 
-        logger.info(f"Analyzing image with vision AI: {image_path}")
+        if diagram_data is None:
+            from vision_diagram_parser import VisionDiagramParser
+
+            logger.info("Analyzing image with vision AI: %s", image_path)
 
-        # Step 1: Extract diagram structure using vision
-        parser = VisionDiagramParser()
-        diagram_data = parser.parse_diagram(image_path, model=args.model)
+            # Step 1: Extract diagram structure using vision
+            parser = VisionDiagramParser()
+            diagram_data = parser.parse_diagram(image_path, model=args.model, use_cache=not args.no_cache)
 
         if args.verbose:
-            logger.info(f"Found {len(diagram_data.get('elements', []))} elements and "
-                       f"{len(diagram_data.get('connections', []))} connections")
+            logger.info("Found %d elements and %d connections",
+                        len(diagram_data.get('elements', [])),
+                        len(diagram_data.get('connections', [])))
 
         # Step 2: Convert to draw.io XML
         converter = DiagramToDrawIO()
@@ -146,7 +170,7 @@ def process_image_file(image_path, output_path, args):
             intermediate_path = output_path.replace('.drawio', '_intermediate.drawio')
             data = drawio_serialization.encode_diagram_data(drawio_xml)
             drawio_utils.write_drawio_output(data, intermediate_path)
-            logger.info(f"Intermediate draw.io saved to: {intermediate_path}")
+            logger.info("Intermediate draw.io saved to: %s", intermediate_path)
 
         # Step 3: Apply C4 conversion
         translator = c4izr(scaling_factor=args.scaling_factor)
@@ -158,7 +182,7 @@ def process_image_file(image_path, output_path, args):
         # Write final output
         data = drawio_serialization.encode_diagram_data(output_xml)
         drawio_utils.write_drawio_output(data, output_path)
-        logger.info(f"C4 conversion successful. Output written to {output_path}")
+        logger.info("C4 conversion successful. Output written to %s", output_path)
 
         # Open output file if requested
         if args.open_output:
@@ -167,80 +191,197 @@ def process_image_file(image_path, output_path, args):
                 try:
                     subprocess.Popen([validated_path, output_path])
                 except FileNotFoundError:
-                    logger.error(f"draw.io executable not found at {args.drawio_path}")
+                    logger.error("draw.io executable not found at %s", args.drawio_path)
                 except PermissionError:
-                    logger.error(f"Permission denied to execute {args.drawio_path}")
+                    logger.error("Permission denied to execute %s", args.drawio_path)
                 except OSError as e:
-                    logger.error(f"Error opening file in draw.io: {str(e)}")
+                    logger.error("Error opening file in draw.io: %s", e)
             else:
-                logger.warning(f"draw.io executable not found or not valid: {args.drawio_path}")
+                logger.warning("draw.io executable not found or not valid: %s", args.drawio_path)
 
         return True
 
     except ImportError as e:
-        logger.error(f"Vision AI dependencies not installed: {e}")
+        logger.error("Vision AI dependencies not installed: %s", e)
         logger.error("Install with: pip install anthropic")
         return False
     except Exception as e:
-        logger.error(f"Error processing image {image_path}: {str(e)}")
+        logger.error("Error processing image %s: %s", image_path, e)
         if args.verbose:
             import traceback
             traceback.print_exc()
         return False
 
+def process_image_directory(dir_path, output_dir, args):
+    """Process all image files in a directory, analyzing them concurrently."""
+    try:
+        from vision_diagram_parser import VisionDiagramParser
+    except ImportError as e:
+        logger.error("Vision AI dependencies not installed: %s", e)
+        logger.error("Install with: pip install anthropic")
+        return False
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Resolve the output directory to an absolute path for safety checks
+    output_dir_resolved = os.path.realpath(output_dir)
+
+    jobs = []
+    traversal_count = 0
+    for root, _, files in os.walk(dir_path):
+        for filename in files:
+            if Path(filename).suffix.lower() in IMAGE_EXTENSIONS:
+                image_path = os.path.join(root, filename)
+                rel_path = os.path.relpath(image_path, dir_path)
+                output_path = os.path.join(output_dir, f"c4_{os.path.splitext(rel_path)[0]}.drawio")
+
+                # Security: Resolve and verify path is within output directory
+                output_path_resolved = os.path.realpath(output_path)
+                if not output_path_resolved.startswith(output_dir_resolved + os.sep):
+                    logger.error("Path traversal attempt detected for %s, skipping", rel_path)
+                    traversal_count += 1
+                    continue
+
+                os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                jobs.append((image_path, output_path))
+
+    if not jobs:
+        logger.error("No image files found in %s", dir_path)
+        return False
+
+    # The vision calls are network-bound, so they run concurrently in one
+    # batch; the results are then converted one by one (conversion may prompt)
+    parser = VisionDiagramParser()
+    logger.info("Analyzing %s images with vision AI...", len(jobs))
+    results = asyncio.run(parser.parse_many([image_path for image_path, _ in jobs], model=args.model,
+                                            use_cache=not args.no_cache))
+
+    success_count = 0
+    failure_count = traversal_count
+    for (image_path, output_path), diagram_data in zip(jobs, results):
+        if isinstance(diagram_data, BaseException):
+            logger.error("Error analyzing image %s: %s", image_path, diagram_data)
+            failure_count += 1
+            continue
+
+        if process_image_file(image_path, output_path, args, diagram_data=diagram_data):
+            success_count += 1
+        else:
+            failure_count += 1
+
+    if args.verbose:
+        logger.info("\nProcessing complete: %s images converted successfully, %s failures", success_count, failure_count)
+
+    return success_count > 0
+
+# Recently decoded diagram payloads, keyed by a digest so the encoded text is
+# not kept alive; small, as it only helps with templates repeated across files
+_DECODED_DIAGRAMS = collections.OrderedDict()
+_DECODED_DIAGRAMS_SIZE = 8
+
+def _decode_diagram_cached(text):
+    """Decode a compressed diagram payload; repeated templates across files decode once."""
+    key = hashlib.blake2b(text.encode('utf-8')).digest()
+    if key in _DECODED_DIAGRAMS:
+        _DECODED_DIAGRAMS.move_to_end(key)
+        return _DECODED_DIAGRAMS[key]
+
+    xml_string = drawio_serialization.decode_diagram_data(text)
+    _DECODED_DIAGRAMS[key] = xml_string
+    if len(_DECODED_DIAGRAMS) > _DECODED_DIAGRAMS_SIZE:
+        _DECODED_DIAGRAMS.popitem(last=False)
+    return xml_string
+
+def _is_converted(xml_string):
+    """Return True if every vertex in the diagram is already a C4 object."""
+    # Cheap rejection for the common case of a diagram with no C4 objects at all
+    if not _C4_MARKER_RE.search(xml_string):
+        return False
+
+    from lxml import etree
+    root = etree.fromstring(xml_string.encode('utf-8'), etree.XMLParser(resolve_entities=False, no_network=True))
+    vertices = [cell for cell in root.iter('mxCell') if cell.get('vertex') == '1']
+    return bool(vertices) and all(
+        cell.getparent().tag == 'object' and cell.getparent().get('c4Type') is not None
+        for cell in vertices
+    )
+
 def process_file(file_path, output_path, args):
     """Process a single DrawIO file."""
     try:
         if args.verbose:
-            logger.info(f"Processing: {file_path}")
+            logger.info("Processing: %s", file_path)
 
         # Read input file
         try:
             from lxml import etree
-            # Create a secure XML parser that prevents XXE attacks
-            parser = etree.XMLParser(
+            # Stream the file with a secure parser that prevents XXE attacks,
+            # stopping once the first diagram (the one converted) is complete
+            context = etree.iterparse(
+                str(file_path),
+                events=('end',),
+                tag='diagram',
                 resolve_entities=False,  # Disable entity resolution
                 no_network=True,         # Disable network access
                 dtd_validation=False,    # Disable DTD validation
-                load_dtd=False           # Don't load external DTDs
+                load_dtd=False,          # Don't load external DTDs
+                huge_tree=True           # Allow very large embedded diagrams
             )
-            tree = etree.parse(file_path, parser)
-            diagrams = tree.findall('.//diagram')
-
-            if len(diagrams) > 1 and args.verbose:
-                logger.info(f"Multiple diagrams found in {file_path}. Converting only the first.")
 
-            if not diagrams:
-                logger.error(f"No diagrams found in {file_path}")
+            xml_string = None
+            diagram_count = 0
+            for _, diagram in context:
+                diagram_count += 1
+                if diagram_count == 1:
+                    if diagram.text and not diagram.text.isspace():
+                        xml_string = _decode_diagram_cached(diagram.text)
+                    else:
+                        graph_model = diagram.find('.//mxGraphModel')
+                        if graph_model is not None:
+                            xml_string = etree.tostring(graph_model, encoding='utf-8').decode('utf-8')
+
+                # Free the parsed diagram and anything before it
+                diagram.clear()
+                while diagram.getprevious() is not None:
+                    del diagram.getparent()[0]
+
+                # Later diagrams are only scanned to report them in verbose mode
+                if not args.verbose:
+                    break
+
+            if diagram_count > 1:
+                logger.info("Multiple diagrams found in %s. Converting only the first.", file_path)
+
+            if not diagram_count:
+                logger.error("No diagrams found in %s", file_path)
                 return False
 
-            xml_data = diagrams[0]
-            if hasattr(xml_data, 'text') and xml_data.text and not xml_data.text.isspace():
-                xml_string = drawio_serialization.decode_diagram_data(xml_data.text)
-            else:
-                xml_data = xml_data.find('.//mxGraphModel')
-                if xml_data is None:
-                    logger.error(f"No mxGraphModel found in file: {file_path}")
-                    return False
-                xml_string = etree.tostring(xml_data, encoding='utf-8').decode('utf-8')
+            if xml_string is None:
+                logger.error("No mxGraphModel found in file: %s", file_path)
+                return False
         except Exception as e:
-            logger.error(f"Error reading file {file_path}: {str(e)}")
+            logger.error("Error reading file %s: %s", file_path, e)
             return False
 
-        # Create translator with settings from args
-        translator = c4izr(scaling_factor=args.scaling_factor)
-        translator.interactive = not args.non_interactive
+        if args.scaling_factor == 1.0 and _is_converted(xml_string):
+            # Already a C4 diagram and nothing to rescale, so the diagram is the output
+            logger.info("%s is already a C4 diagram. Skipping translation.", file_path)
+            output_xml = xml_string
+        else:
+            # Create translator with settings from args
+            translator = c4izr(scaling_factor=args.scaling_factor)
+            translator.interactive = not args.non_interactive
 
-        # Translate the diagram
-        output_xml = translator.translate(xml_string)
+            # Translate the diagram
+            output_xml = translator.translate(xml_string)
 
         # Write output
         try:
             data = drawio_serialization.encode_diagram_data(output_xml)
             drawio_utils.write_drawio_output(data, output_path)
-            logger.info(f"Conversion successful. Output written to {output_path}")
+            logger.info("Conversion successful. Output written to %s", output_path)
         except Exception as e:
-            logger.error(f"Error writing output to {output_path}: {str(e)}")
+            logger.error("Error writing output to %s: %s", output_path, e)
             return False
 
         # Open output file if requested
@@ -250,19 +391,32 @@ def process_file(file_path, output_path, args):
                 try:
                     subprocess.Popen([validated_path, output_path])
                 except FileNotFoundError:
-                    logger.error(f"draw.io executable not found at {args.drawio_path}")
+                    logger.error("draw.io executable not found at %s", args.drawio_path)
                 except PermissionError:
-                    logger.error(f"Permission denied to execute {args.drawio_path}")
+                    logger.error("Permission denied to execute %s", args.drawio_path)
                 except OSError as e:
-                    logger.error(f"Error opening file in draw.io: {str(e)}")
+                    logger.error("Error opening file in draw.io: %s", e)
             else:
-                logger.warning(f"draw.io executable not found or not valid: {args.drawio_path}")
+                logger.warning("draw.io executable not found or not valid: %s", args.drawio_path)
 
         return True
     except Exception as e:
-        logger.error(f"Error processing {file_path}: {str(e)}")
+        logger.error("Error processing %s: %s", file_path, e)
         return False
 
+def iter_drawio_files(root):
+    """Recursively yield .drawio file paths under root, without following directory symlinks."""
+    try:
+        entries = list(os.scandir(root))
+    except OSError:
+        # Like os.walk, skip directories that cannot be listed
+        return
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from iter_drawio_files(entry.path)
+        elif entry.name.lower().endswith('.drawio'):
+            yield entry.path
+
 def process_directory(dir_path, output_dir, args):
     """Process all .drawio files in a directory."""
     success_count = 0
@@ -274,32 +428,52 @@ def process_directory(dir_path, output_dir, args):
     # Resolve the output directory to an absolute path for safety checks
     output_dir_resolved = os.path.realpath(output_dir)
 
-    for root, _, files in os.walk(dir_path):
-        for filename in files:
-            if filename.lower().endswith('.drawio'):
-                file_path = os.path.join(root, filename)
-                # Generate output path, preserving directory structure
-                rel_path = os.path.relpath(file_path, dir_path)
-                output_path = os.path.join(output_dir, f"c4_{rel_path}")
-
-                # Security: Resolve and verify path is within output directory
-                output_path_resolved = os.path.realpath(output_path)
-                if not output_path_resolved.startswith(output_dir_resolved + os.sep):
-                    logger.error(f"Path traversal attempt detected for {filename}, skipping")
-                    failure_count += 1
-                    continue
-
-                # Ensure output directory exists
-                output_file_dir = os.path.dirname(output_path)
-                os.makedirs(output_file_dir, exist_ok=True)
+    # Collect (input, output) pairs first so they can be converted in parallel
+    jobs = []
+    # Output subdirectories already created, so each is made only once
+    created = {output_dir}
+    for file_path in iter_drawio_files(dir_path):
+        # Generate output path, preserving directory structure
+        rel_path = os.path.relpath(file_path, dir_path)
+        output_path = os.path.join(output_dir, f"c4_{rel_path}")
+
+        # Security: Resolve and verify path is within output directory
+        output_path_resolved = os.path.realpath(output_path)
+        if not output_path_resolved.startswith(output_dir_resolved + os.sep):
+            logger.error("Path traversal attempt detected for %s, skipping", rel_path)
+            failure_count += 1
+            continue
+
+        # Ensure output directory exists
+        output_file_dir = os.path.dirname(output_path)
+        if output_file_dir not in created:
+            os.makedirs(output_file_dir, exist_ok=True)
+            created.add(output_file_dir)
+
+        jobs.append((file_path, output_path))
+
+    if args.non_interactive and len(jobs) > 1:
+        # Files are independent, so batch runs convert them across all cores;
+        # interactive runs stay sequential because they prompt for each file
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+            futures = {executor.submit(process_file, file_path, output_path, args): file_path
+                       for file_path, output_path in jobs}
+            results = []
+            for future in as_completed(futures):
+                # A worker that dies (e.g. BrokenProcessPool) fails its file, not the run
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    logger.error("Error processing %s: %s", futures[future], e)
+                    results.append(False)
+    else:
+        results = [process_file(file_path, output_path, args) for file_path, output_path in jobs]
 
-                if process_file(file_path, output_path, args):
-                    success_count += 1
-                else:
-                    failure_count += 1
+    success_count += results.count(True)
+    failure_count += results.count(False)
 
     if args.verbose:
-        logger.info(f"\nProcessing complete: {success_count} files converted successfully, {failure_count} failures")
+        logger.info("\nProcessing complete: %s files converted successfully, %s failures", success_count, failure_count)
 
     return success_count > 0
 
@@ -319,13 +493,17 @@ def main():
         return 1
 
     # Check if input is an image file
-    image_extensions = {'.png', '.jpg', '.jpeg', '.gif', '.webp'}
-    is_image = input_path.suffix.lower() in image_extensions
+    is_image = input_path.suffix.lower() in IMAGE_EXTENSIONS
+
+    if args.from_image and input_path.is_dir():
+        # Process every image in the directory using vision AI
+        output_dir = args.output if os.path.isdir(args.output) else "c4_output"
+        return 0 if process_image_directory(input_path, output_dir, args) else 1
 
     if args.from_image or is_image:
         # Process as image using vision AI
         if not input_path.is_file():
-            logger.error(f"Error: --from-image requires a single image file, not a directory.")
+            logger.error(f"Error: Input path '{args.input}' is not an image file.")
             return 1
         output_path = args.output
         return 0 if process_image_file(input_path, output_path, args) else 1
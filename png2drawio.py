@@ -3,11 +3,58 @@
 Convert structured diagram data (from vision analysis) to draw.io XML format.
 """
 
-import xml.etree.ElementTree as ET
-import uuid
+from functools import lru_cache
+from types import MappingProxyType
 from typing import Dict, List
 
 
+# Characters that must be escaped inside a double-quoted XML attribute;
+# whitespace controls are kept as character references like lxml does
+_ATTR_ESCAPES = str.maketrans({
+    "&": "&amp;",
+    "<": "&lt;",
+    ">": "&gt;",
+    '"': "&quot;",
+    "\n": "&#10;",
+    "\r": "&#13;",
+    "\t": "&#9;",
+})
+
+
+def _escape_attr(value) -> str:
+    """Escape a value for use inside a double-quoted XML attribute."""
+    return str(value).translate(_ATTR_ESCAPES)
+
+
+# Read-only style tables, built once at import time
+_ELEMENT_STYLES = MappingProxyType({
+    "box": "rounded=0;whiteSpace=wrap;html=1;",
+    "person": "shape=umlActor;verticalLabelPosition=bottom;verticalAlign=top;html=1;outlineConnect=0;",
+    "database": "shape=cylinder3;whiteSpace=wrap;html=1;boundedLbl=1;backgroundOutline=1;size=15;",
+    "cylinder": "shape=cylinder3;whiteSpace=wrap;html=1;boundedLbl=1;backgroundOutline=1;size=15;",
+    "cloud": "ellipse;shape=cloud;whiteSpace=wrap;html=1;",
+    "other": "rounded=1;whiteSpace=wrap;html=1;",
+})
+
+_CONN_STYLES = MappingProxyType({
+    "arrow": "endArrow=classic;html=1;rounded=0;",
+    "bidirectional": "endArrow=classic;startArrow=classic;html=1;rounded=0;",
+    "dashed": "endArrow=classic;html=1;rounded=0;dashed=1;",
+    "other": "endArrow=classic;html=1;rounded=0;",
+})
+
+
+# Colour words recognised anywhere in style hints ("lightblue" counts as
+# blue), checked in this order so the first listed colour present wins
+_COLOR_FILLS = (
+    ("blue", "fillColor=#dae8fc;strokeColor=#6c8ebf;"),
+    ("green", "fillColor=#d5e8d4;strokeColor=#82b366;"),
+    ("red", "fillColor=#f8cecc;strokeColor=#b85450;"),
+    ("gray", "fillColor=#f5f5f5;strokeColor=#666666;"),
+    ("grey", "fillColor=#f5f5f5;strokeColor=#666666;"),
+)
+
+
 class DiagramToDrawIO:
     """Convert structured diagram data to draw.io XML."""
 
@@ -21,8 +68,9 @@ class DiagramToDrawIO:
         """
         self.canvas_width = canvas_width
         self.canvas_height = canvas_height
+        self._id_counter = 0
 
-    def convert(self, diagram_data: Dict) -> str:
+    def convert(self, diagram_data: Dict) -> bytes:
         """
         Convert structured diagram data to draw.io XML.
 
@@ -30,32 +78,20 @@ class DiagramToDrawIO:
             diagram_data: Dictionary with 'elements' and 'connections' keys
 
         Returns:
-            XML string in draw.io format
+            UTF-8 encoded XML in draw.io format
         """
-        # Create root mxGraphModel
-        root = ET.Element("mxGraphModel", {
-            "dx": "1418",
-            "dy": "948",
-            "grid": "1",
-            "gridSize": "10",
-            "guides": "1",
-            "tooltips": "1",
-            "connect": "1",
-            "arrows": "1",
-            "fold": "1",
-            "page": "1",
-            "pageScale": "1",
-            "pageWidth": str(self.canvas_width),
-            "pageHeight": str(self.canvas_height),
-            "math": "0",
-            "shadow": "0"
-        })
-
-        graph_root = ET.SubElement(root, "root")
-
-        # Add required base cells
-        ET.SubElement(graph_root, "mxCell", {"id": "0"})
-        ET.SubElement(graph_root, "mxCell", {"id": "1", "parent": "0"})
+        # IDs only need to be unique within one document; restarting the
+        # counter keeps the output deterministic for the same input
+        self._id_counter = 0
+
+        # Assemble the document from string templates; the cells are flat and
+        # few attributes vary, so this avoids building Element objects at all
+        parts = [
+            '<mxGraphModel dx="1418" dy="948" grid="1" gridSize="10" guides="1" tooltips="1" '
+            'connect="1" arrows="1" fold="1" page="1" pageScale="1" '
+            f'pageWidth="{self.canvas_width}" pageHeight="{self.canvas_height}" math="0" shadow="0">'
+            '<root><mxCell id="0"/><mxCell id="1" parent="0"/>'
+        ]
 
         # Track element IDs for connections
         element_id_map = {}
@@ -63,19 +99,34 @@ class DiagramToDrawIO:
         # Add all elements (boxes, shapes, etc.)
         elements = diagram_data.get("elements", [])
         for elem in elements:
-            drawio_id = self._add_element(graph_root, elem)
+            drawio_id = self._add_element(parts, elem)
             element_id_map[elem["id"]] = drawio_id
 
+        # Resolve connections to draw.io IDs up front, dropping any whose
+        # endpoints were not among the elements
+        known = element_id_map.__contains__
+        connections = [
+            (element_id_map[conn["source"]], element_id_map[conn["target"]],
+             conn.get("label", ""), conn.get("type", "arrow"))
+            for conn in diagram_data.get("connections", [])
+            if known(conn.get("source")) and known(conn.get("target"))
+        ]
+
         # Add all connections (arrows, edges)
-        connections = diagram_data.get("connections", [])
-        for conn in connections:
-            self._add_connection(graph_root, conn, element_id_map)
+        for source_id, target_id, label, conn_type in connections:
+            self._add_connection(parts, source_id, target_id, label, conn_type)
 
-        return ET.tostring(root, encoding='unicode', method='xml')
+        parts.append('</root></mxGraphModel>')
+        return ''.join(parts).encode('utf-8')
 
-    def _add_element(self, parent: ET.Element, element: Dict) -> str:
-        """Add a diagram element (box, shape) to the XML."""
-        elem_id = str(uuid.uuid4())
+    def _new_id(self, prefix: str) -> str:
+        """Return the next sequential cell ID with the given prefix."""
+        self._id_counter += 1
+        return f"{prefix}{self._id_counter}"
+
+    def _add_element(self, parts: List[str], element: Dict) -> str:
+        """Append a diagram element (box, shape) to the XML parts."""
+        elem_id = self._new_id("v")
         elem_type = element.get("type", "box")
         label = element.get("label", "")
         description = element.get("description", "")
@@ -99,61 +150,31 @@ class DiagramToDrawIO:
         y = self._normalize_coordinate(y, self.canvas_height)
 
         # Choose style based on element type
-        style = self._get_style_for_type(elem_type, element.get("style_hints", ""))
-
-        # Create mxCell for the element
-        mxcell = ET.SubElement(parent, "mxCell", {
-            "id": elem_id,
-            "value": full_label,
-            "style": style,
-            "vertex": "1",
-            "parent": "1"
-        })
-
-        # Add geometry
-        ET.SubElement(mxcell, "mxGeometry", {
-            "x": str(x),
-            "y": str(y),
-            "width": str(width),
-            "height": str(height),
-            "as": "geometry"
-        })
+        style = self._get_style_for_type(elem_type, element.get("style_hints", "").lower())
 
-        return elem_id
+        # Create mxCell for the element with its geometry
+        parts.append(
+            f'<mxCell id="{elem_id}" value="{_escape_attr(full_label)}" style="{style}" vertex="1" parent="1">'
+            f'<mxGeometry x="{_escape_attr(x)}" y="{_escape_attr(y)}" width="{_escape_attr(width)}" '
+            f'height="{_escape_attr(height)}" as="geometry"/></mxCell>'
+        )
 
-    def _add_connection(self, parent: ET.Element, connection: Dict, id_map: Dict[str, str]) -> str:
-        """Add a connection (arrow, edge) to the XML."""
-        conn_id = str(uuid.uuid4())
-        label = connection.get("label", "")
-        conn_type = connection.get("type", "arrow")
-
-        # Map source and target from vision IDs to draw.io IDs
-        source_id = id_map.get(connection.get("source"))
-        target_id = id_map.get(connection.get("target"))
+        return elem_id
 
-        if not source_id or not target_id:
-            # Skip connections with missing endpoints
-            return conn_id
+    def _add_connection(self, parts: List[str], source_id: str, target_id: str,
+                        label: str, conn_type: str) -> str:
+        """Append a connection (arrow, edge) between resolved draw.io IDs to the XML parts."""
+        conn_id = self._new_id("e")
 
         # Choose style based on connection type
         style = self._get_connection_style(conn_type)
 
-        # Create mxCell for the connection
-        mxcell = ET.SubElement(parent, "mxCell", {
-            "id": conn_id,
-            "value": label,
-            "style": style,
-            "edge": "1",
-            "parent": "1",
-            "source": source_id,
-            "target": target_id
-        })
-
-        # Add geometry
-        ET.SubElement(mxcell, "mxGeometry", {
-            "relative": "1",
-            "as": "geometry"
-        })
+        # Create mxCell for the connection with its geometry
+        parts.append(
+            f'<mxCell id="{conn_id}" value="{_escape_attr(label)}" style="{style}" edge="1" parent="1" '
+            f'source="{source_id}" target="{target_id}">'
+            '<mxGeometry relative="1" as="geometry"/></mxCell>'
+        )
 
         return conn_id
 
@@ -171,40 +192,27 @@ class DiagramToDrawIO:
             # Absolute pixel position
             return value
 
-    def _get_style_for_type(self, elem_type: str, style_hints: str) -> str:
-        """Get draw.io style string based on element type."""
-        styles = {
-            "box": "rounded=0;whiteSpace=wrap;html=1;",
-            "person": "shape=umlActor;verticalLabelPosition=bottom;verticalAlign=top;html=1;outlineConnect=0;",
-            "database": "shape=cylinder3;whiteSpace=wrap;html=1;boundedLbl=1;backgroundOutline=1;size=15;",
-            "cylinder": "shape=cylinder3;whiteSpace=wrap;html=1;boundedLbl=1;backgroundOutline=1;size=15;",
-            "cloud": "ellipse;shape=cloud;whiteSpace=wrap;html=1;",
-            "other": "rounded=1;whiteSpace=wrap;html=1;",
-        }
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _get_style_for_type(elem_type: str, style_hints: str) -> str:
+        """
+        Get draw.io style string based on element type.
 
-        base_style = styles.get(elem_type, styles["box"])
+        style_hints must already be lowercased; results are cached per
+        (type, hints) pair since vision output repeats the same few styles.
+        """
+        base_style = _ELEMENT_STYLES.get(elem_type, _ELEMENT_STYLES["box"])
 
         # Add color hints if mentioned in style_hints
-        if "blue" in style_hints.lower():
-            base_style += "fillColor=#dae8fc;strokeColor=#6c8ebf;"
-        elif "green" in style_hints.lower():
-            base_style += "fillColor=#d5e8d4;strokeColor=#82b366;"
-        elif "red" in style_hints.lower():
-            base_style += "fillColor=#f8cecc;strokeColor=#b85450;"
-        elif "gray" in style_hints.lower() or "grey" in style_hints.lower():
-            base_style += "fillColor=#f5f5f5;strokeColor=#666666;"
+        for color, fill in _COLOR_FILLS:
+            if color in style_hints:
+                return base_style + fill
 
         return base_style
 
     def _get_connection_style(self, conn_type: str) -> str:
         """Get draw.io style string for connection type."""
-        styles = {
-            "arrow": "endArrow=classic;html=1;rounded=0;",
-            "bidirectional": "endArrow=classic;startArrow=classic;html=1;rounded=0;",
-            "dashed": "endArrow=classic;html=1;rounded=0;dashed=1;",
-            "other": "endArrow=classic;html=1;rounded=0;",
-        }
-        return styles.get(conn_type, styles["arrow"])
+        return _CONN_STYLES.get(conn_type, _CONN_STYLES["arrow"])
 
 
 def main():
@@ -229,7 +237,7 @@ def main():
     drawio_xml = converter.convert(diagram_data)
 
     # Output
-    print(drawio_xml)
+    print(drawio_xml.decode('utf-8'))
 
 
 if __name__ == "__main__":
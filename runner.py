@@ -1,16 +1,22 @@
+import argparse
+import collections
+import functools
+import hashlib
+import io
 import os
 import shutil
 import platform
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 ##
 #
 # NOTE: This is a legacy runner script. Consider using main.py instead.
 #
 ##
+import c4izr as c4izr_module
 from c4izr import c4izr
 import subprocess
 import lxml.etree as etree
 import drawio_serialization
-import xml.etree.ElementTree as ET
 import drawio_utils
 
 
@@ -19,8 +25,9 @@ class XMLParseException(Exception):
     pass
 
 
+@functools.lru_cache(maxsize=1)
 def get_drawio_executable_path():
-    """Get the draw.io executable path for the current platform."""
+    """Get the draw.io executable path for the current platform; looked up once per process."""
     # First try to find it in PATH
     drawio_path = shutil.which("draw.io") or shutil.which("drawio")
     if drawio_path:
@@ -35,69 +42,246 @@ def get_drawio_executable_path():
         return "/usr/bin/drawio"
 
 
-def drawio_xml(xml_file):
+def _diagram_source(diagram):
+    """Capture what is needed to rebuild a <diagram>'s XML after the element is cleared."""
+    # NOTE!!
+    # sometimes the "plain xml" files create with drawio desktop will still have the text
+    # attribute in them with '\n ' as content so we need to check for that as well
+    if diagram.text and not diagram.text.isspace():
+        return diagram.text, None
+    return None, etree.tostring(diagram.find('.//mxGraphModel'), encoding='unicode')
+
+
+def _diagram_xml(source):
+    """Return the mxGraphModel XML string for a captured diagram, decoding it if compressed."""
+    text, graph_model_xml = source
+    if text is not None:
+        return drawio_serialization.decode_diagram_data(text)
+    return graph_model_xml
+
+
+def drawio_xml(xml_file, interactive=True, data=None):
+    # data holds the file's bytes when the caller has already read them,
+    # in which case the file is not opened again
     try:
-        # Create a secure XML parser that prevents XXE attacks
-        parser = etree.XMLParser(
+        # Stream the diagrams with a secure parser that prevents XXE attacks,
+        # capturing each one's content and then clearing it, so memory is
+        # bounded by the captured payloads rather than the whole parsed tree
+        context = etree.iterparse(
+            io.BytesIO(data) if data is not None else xml_file,
+            events=('end',),
+            tag='diagram',
             resolve_entities=False,  # Disable entity resolution
             no_network=True,         # Disable network access
             dtd_validation=False,    # Disable DTD validation
             load_dtd=False           # Don't load external DTDs
         )
-        tree = etree.parse(xml_file, parser)
-        diagrams = tree.findall('.//diagram')
-        if len(diagrams) > 1:
+        names = []
+        sources = []
+        for _, diagram in context:
+            names.append(diagram.get('name', 'Unnamed Diagram'))
+            # Without a prompt only the first diagram is ever converted
+            if interactive or not sources:
+                sources.append(_diagram_source(diagram))
+            diagram.clear()
+            while diagram.getprevious() is not None:
+                del diagram.getparent()[0]
+
+        if len(names) > 1 and interactive:
             print(f"WARN - Multiple diagrams found in file: {xml_file}.")
-            for i, diagram in enumerate(diagrams):
-                print(f"{i + 1}: {diagram.get('name', 'Unnamed Diagram')}")
+            for i, name in enumerate(names):
+                print(f"{i + 1}: {name}")
             choice = input("Enter the number of the diagram to convert (or 'all' to process all): ").strip().lower()
             if choice == 'all':
-                return [ET.tostring(diagram.find('.//mxGraphModel'), encoding='utf-8').decode('utf-8') for diagram in diagrams]
+                return [_diagram_xml(source) for source in sources]
             else:
                 try:
                     index = int(choice) - 1
-                    if 0 <= index < len(diagrams):
-                        xml_data = diagrams[index]
+                    if 0 <= index < len(sources):
+                        source = sources[index]
                     else:
                         print("Invalid choice. Defaulting to the first diagram.")
-                        xml_data = diagrams[0]
+                        source = sources[0]
                 except ValueError:
                     print("Invalid input. Defaulting to the first diagram.")
-                    xml_data = diagrams[0]
+                    source = sources[0]
         else:
-            xml_data = diagrams[0]
+            if len(names) > 1:
+                print(f"WARN - Multiple diagrams found in file: {xml_file}. Converting the first.")
+            source = sources[0]
 
-        # NOTE!!
-        # sometimes the "plain xml" files create with drawio desktop will still have the text
-        # attribute in them with '\n ' as content so we need to check for that as well
-        if hasattr(xml_data, 'text') and not xml_data.text.isspace():
-            try:
-                xml_string = drawio_serialization.decode_diagram_data(xml_data.text)
-                return xml_string
-            except Exception:
-                pass
-        else:
-            xml_data = xml_data.find('.//mxGraphModel')
-        xml_string = ET.tostring(xml_data, encoding='utf-8').decode('utf-8')
-        return xml_string
+        return _diagram_xml(source)
     except Exception as e:
         error_message = f"Error parsing XML file: {xml_file}, {str(e)}"
         raise XMLParseException(error_message)
 
 
-def do_process(file):
-    input_xml = drawio_xml(file)
-    translator = c4izr()
-    output_xml = translator.translate(input_xml)
+_TRANSLATOR = None
+
+# Cache entries are checked to be well-formed before they are served
+_CACHE_PARSER = etree.XMLParser(resolve_entities=False, no_network=True, load_dtd=False)
+
+# Recent non-interactive translations made in this process, keyed by a digest
+# of the diagram XML; only the last few are kept, since repeat runs are served
+# by the on-disk cache and this only catches copies within one run
+_OUTPUT_CACHE = collections.OrderedDict()
+_OUTPUT_CACHE_SIZE = 16
+
+
+def _get_translator():
+    """
+    Return this process's shared translator.
+
+    c4izr keeps no per-document state (callers set interactive for each
+    file), so one instance serves every file, including in batch workers.
+    """
+    global _TRANSLATOR
+    if _TRANSLATOR is None:
+        _TRANSLATOR = c4izr()
+    return _TRANSLATOR
+
+
+@functools.lru_cache(maxsize=1)
+def _translator_fingerprint():
+    """
+    Identify the translator that produced a cached result.
+
+    Combines the cache format version with a digest of the modules whose
+    code shapes the output, so editing the translator invalidates old entries.
+    """
+    digest = hashlib.blake2b(TRANSLATION_CACHE_VERSION.encode('ascii'), digest_size=16)
+    for module in (c4izr_module, drawio_utils):
+        with open(module.__file__, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _cache_path(data):
+    """Return the translation cache entry for a file's contents."""
+    digest = hashlib.blake2b(data)
+    digest.update(_translator_fingerprint().encode('ascii'))
+    return os.path.join(TRANSLATION_CACHE_DIR, f"{digest.hexdigest()}.xml")
+
+
+def _read_cache(cache_path):
+    """
+    Return a cached translation, or None on a miss.
+
+    Entries that cannot be read or are not a translated mxGraphModel are
+    removed, so the file is translated again and the entry rewritten.
+    """
+    try:
+        with open(cache_path, 'rb') as f:
+            cached = f.read()
+    except FileNotFoundError:
+        return None
+    except OSError:
+        cached = None
+
+    if cached is not None:
+        try:
+            if etree.fromstring(cached, _CACHE_PARSER).tag == 'mxGraphModel':
+                return cached.decode('utf-8')
+        except (etree.XMLSyntaxError, UnicodeDecodeError):
+            pass
+
+    try:
+        os.remove(cache_path)
+    except OSError:
+        pass
+    return None
+
+
+def _write_cache(cache_path, output_xml):
+    """Atomically store a translation; the cache is best effort, so failures are ignored."""
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(TRANSLATION_CACHE_DIR, exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(output_xml)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+
+
+def do_process(file, interactive=True, use_cache=True):
+    # Read the file once; the same bytes are hashed for the cache and parsed
+    try:
+        with open(file, 'rb') as f:
+            data = f.read()
+    except OSError as e:
+        raise XMLParseException(f"Error reading file: {file}, {str(e)}")
+
+    # Prompted conversions depend on the user's answers, so only the
+    # deterministic non-interactive result is cached
+    cache_path = _cache_path(data) if use_cache and not interactive else None
+    if cache_path:
+        cached = _read_cache(cache_path)
+        if cached is not None:
+            return cached
+
+    input_xml = drawio_xml(file, interactive, data)
+
+    # Files that differ only in their mxfile wrapper (timestamps, etags) or
+    # copies of the same diagram share one translation within a run
+    output_key = hashlib.blake2b(input_xml.encode('utf-8')).digest() if use_cache and not interactive else None
+    if output_key in _OUTPUT_CACHE:
+        _OUTPUT_CACHE.move_to_end(output_key)
+        output_xml = _OUTPUT_CACHE[output_key]
+    else:
+        translator = _get_translator()
+        translator.interactive = interactive
+        output_xml = translator.translate(input_xml)
+        if output_key is not None:
+            _OUTPUT_CACHE[output_key] = output_xml
+            if len(_OUTPUT_CACHE) > _OUTPUT_CACHE_SIZE:
+                _OUTPUT_CACHE.popitem(last=False)
     # pretty_output_xml = translator.pretty_print(output_xml)
     # print(pretty_output_xml)
+
+    if cache_path:
+        _write_cache(cache_path, output_xml)
     return output_xml
 
 
+def translate_file(file_path, use_cache=True):
+    """
+    Translate a single file without previews or prompts.
+
+    Runs in a worker process, so errors are returned rather than raised:
+    the result is (file_path, encoded diagram data or None, error message or None).
+    Any failure is reported this way, so one bad file cannot abort a batch.
+    """
+    try:
+        output_xml = do_process(file_path, interactive=False, use_cache=use_cache)
+        return file_path, drawio_serialization.encode_diagram_data(output_xml), None
+    except XMLParseException as e:
+        return file_path, None, f"Error processing file: {e}"
+    except ValueError as e:
+        return file_path, None, f"Error translating file: {e}"
+    except Exception as e:
+        return file_path, None, f"Error converting file: {file_path}, {e}"
+
 
 # Use platform-independent path detection
 DRAWIO_EXECUTABLE_PATH = get_drawio_executable_path()
+# Checked once; the executable is not expected to appear or vanish mid-run
+DRAWIO_AVAILABLE = os.path.isfile(DRAWIO_EXECUTABLE_PATH)
 DRAWIO_EXISTING_DIAGRAMS_DIR = os.environ.get('DRAWIO_DIAGRAMS_DIR', os.path.expanduser('~/drawio_diagrams'))
+# Non-interactive translations are cached here by input content hash
+TRANSLATION_CACHE_DIR = os.environ.get('C4IZR_CACHE_DIR', os.path.expanduser('~/.cache/c4izr/translations'))
+# Set C4IZR_NO_CACHE=1 (or pass --no-cache) to always translate afresh
+TRANSLATION_CACHE_ENABLED = os.environ.get('C4IZR_NO_CACHE', '') in ('', '0')
+# Bump when the layout of cache entries changes
+TRANSLATION_CACHE_VERSION = "1"
+# Directory runs write each result here, preserving the input layout
+BATCH_OUTPUT_DIR = "c4_output"
+# File types picked up when walking a diagrams directory
+DIAGRAM_EXTENSIONS = ('.drawio', '.xml')
+# Seconds between checks for a closed preview, so Ctrl-C is handled promptly
+PREVIEW_POLL_INTERVAL = 0.2
+# Directory listings are latency-bound on network shares, so many can be in flight at once
+WALK_THREADS = 32
 
 
 def ask_user_to_translate():
@@ -105,48 +289,161 @@ def ask_user_to_translate():
     return response in ('', 'yes', 'y')
 
 
-def process_file(file_path):
-    """Process a single drawio file."""
-    drawio_path = get_drawio_executable_path()
-
-    if not os.path.isfile(drawio_path):
+def _drawio_for_preview():
+    """Return the draw.io executable path, or None (with a warning) when previews must be skipped."""
+    drawio_path = DRAWIO_EXECUTABLE_PATH
+    if not DRAWIO_AVAILABLE:
         print(f"Warning: draw.io executable not found at {drawio_path}")
         print("Skipping file preview. Set the path in DRAWIO_EXECUTABLE_PATH environment variable.")
-    else:
+        return None
+    return drawio_path
+
+
+def preview(drawio_path, path):
+    """Open a file in draw.io and wait for it to be closed."""
+    try:
+        process = subprocess.Popen([drawio_path, path])
+    except FileNotFoundError:
+        print(f"Error: Could not find draw.io executable at {drawio_path}")
+        return
+    except PermissionError:
+        print(f"Error: Permission denied to execute {drawio_path}")
+        return
+
+    try:
+        # Wait in short slices: on Windows an untimed wait blocks in
+        # WaitForSingleObject, where Ctrl-C is not seen until draw.io exits
+        while True:
+            try:
+                process.wait(timeout=PREVIEW_POLL_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+    except KeyboardInterrupt:
+        # Don't leave draw.io running when the user aborts the review
+        process.terminate()
+        raise
+
+
+def process_file(file_path, output_path="output.drawio"):
+    """
+    Process a single drawio file.
+
+    Returns the output path, or None if the file was not translated.
+    """
+    drawio_path = _drawio_for_preview()
+    if drawio_path:
         print("Instructions: The original drawio file will be opened for review. Please review the file and close it when done.")
-        try:
-            process = subprocess.Popen([drawio_path, file_path])
-            process.wait()
-        except FileNotFoundError:
-            print(f"Error: Could not find draw.io executable at {drawio_path}")
-        except PermissionError:
-            print(f"Error: Permission denied to execute {drawio_path}")
+        preview(drawio_path, file_path)
 
     if not ask_user_to_translate():
-        return
+        return None
 
     try:
         output_xml = do_process(file_path)
         data = drawio_serialization.encode_diagram_data(output_xml)
-        drawio_utils.write_drawio_output(data, "output.drawio")
-
-        if os.path.isfile(drawio_path):
-            try:
-                process = subprocess.Popen([drawio_path, 'output.drawio'])
-                process.wait()
-            except (FileNotFoundError, PermissionError) as e:
-                print(f"Error opening output file: {e}")
+        drawio_utils.write_drawio_output(data, output_path)
     except XMLParseException as e:
         print(f"Error processing file: {e}")
+        return None
     except ValueError as e:
         print(f"Error translating file: {e}")
+        return None
+
+    if drawio_path:
+        preview(drawio_path, output_path)
+    return output_path
+
+def _list_dir(path):
+    """List one directory as (path, subdirectory names, other entry names)."""
+    dirs, files = [], []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.name)
+                else:
+                    files.append(entry.name)
+    except OSError:
+        # Like os.walk, skip directories that cannot be listed
+        pass
+    return path, dirs, files
+
 
-def process_directory(directory_path):
-    for root, _, files in os.walk(directory_path):
+def walk(top, threads=WALK_THREADS):
+    """
+    Multithreaded os.walk for diagram directories on network filesystems.
+
+    Subdirectories are listed concurrently as soon as they are discovered, so
+    (root, dirs, files) tuples arrive in no particular order, and the dirs
+    list cannot be modified to prune the walk.
+    """
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        pending = {executor.submit(_list_dir, top)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                root, dirs, files = future.result()
+                pending.update(executor.submit(_list_dir, os.path.join(root, d)) for d in dirs)
+                yield root, dirs, files
+
+
+def _output_path(file_path, directory_path):
+    """Return the output path for a file in a directory run, creating its parent directory."""
+    rel_path = os.path.relpath(file_path, directory_path)
+    output_path = os.path.join(BATCH_OUTPUT_DIR, f"c4_{rel_path}")
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    return output_path
+
+
+def process_directory(directory_path, batch=False, use_cache=None):
+    if use_cache is None:
+        use_cache = TRANSLATION_CACHE_ENABLED
+
+    file_paths = []
+    for root, _, files in walk(directory_path):
         for filename in files:
+            # Only diagram files are worth a stat, a preview or a parse
+            if not filename.lower().endswith(DIAGRAM_EXTENSIONS):
+                continue
             file_path = os.path.join(root, filename)
             if os.path.isfile(file_path):
-                process_file(file_path)
+                file_paths.append(file_path)
+    # The threaded walk yields directories in completion order; sort so every
+    # run previews, prompts and reports files in the same order
+    file_paths.sort()
+
+    if not batch:
+        # Each file is previewed right before its prompt and its result right
+        # after, so every decision is made with the diagram in front of the user
+        for file_path in file_paths:
+            print(f"File: {file_path}")
+            process_file(file_path, _output_path(file_path, directory_path))
+        return
+
+    # Batch mode: translation is CPU-bound and files are independent, so
+    # convert them across all cores and write the results as they arrive
+    with ProcessPoolExecutor() as executor:
+        for file_path, data, error in executor.map(functools.partial(translate_file, use_cache=use_cache), file_paths):
+            if error:
+                print(error)
+                continue
+            output_path = _output_path(file_path, directory_path)
+            drawio_utils.write_drawio_output(data, output_path)
+            print(f"Converted {file_path} -> {output_path}")
 
 if __name__ == "__main__":
-    process_directory(DRAWIO_EXISTING_DIAGRAMS_DIR)
+    arg_parser = argparse.ArgumentParser(description="Review and convert every diagram in DRAWIO_DIAGRAMS_DIR.")
+    arg_parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Convert all files in parallel without previews or prompts"
+    )
+    arg_parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Translate every file afresh instead of reusing cached results"
+    )
+    args = arg_parser.parse_args()
+    process_directory(DRAWIO_EXISTING_DIAGRAMS_DIR, batch=args.batch,
+                      use_cache=TRANSLATION_CACHE_ENABLED and not args.no_cache)
@@ -9,6 +9,7 @@ import os
 import sys
 import tempfile
 import shutil
+import string
 import xml.etree.ElementTree as ET
 from c4izr import c4izr
 import drawio_serialization
@@ -106,6 +107,52 @@ def test_basic_conversion():
     return True
 
 
+def test_geometry_scaling():
+    """Test that vertex positions are scaled away from the diagram center."""
+    print("Testing geometry scaling...")
+
+    sample_xml = '''<mxGraphModel>
+      <root>
+        <mxCell id="0" />
+        <mxCell id="1" parent="0" />
+        <mxCell id="2" value="System A" parent="1" vertex="1">
+          <mxGeometry x="0" y="0" width="100" height="100" as="geometry" />
+        </mxCell>
+        <mxCell id="3" value="System B" parent="1" vertex="1">
+          <mxGeometry x="300" y="bogus" width="100" height="100" as="geometry" />
+        </mxCell>
+      </root>
+    </mxGraphModel>'''
+
+    translator = c4izr(scaling_factor=2.0)
+    translator.interactive = False
+
+    output_root = ET.fromstring(translator.translate(sample_xml))
+    geometries = {obj.get("id"): obj.find("mxCell/mxGeometry") for obj in output_root.iter("object")}
+
+    # Only System A has valid bounds, so the center is (50, 50)
+    assert float(geometries["2"].get("x")) == -50.0, "x should be scaled away from the center"
+    assert float(geometries["2"].get("y")) == -50.0, "y should be scaled away from the center"
+    assert float(geometries["3"].get("x")) == 550.0, "x should be scaled even when y is invalid"
+    assert geometries["3"].get("y") == "bogus", "Invalid coordinates should be carried over unchanged"
+    assert geometries["2"].get("width") == "240", "C4 boxes should use the standard width"
+
+    print("Geometry scaling test passed!")
+    return True
+
+
+def test_filter_string():
+    """Test that exit and entry points are stripped from style strings."""
+    print("Testing style filtering...")
+
+    assert c4izr.filter_string("edgeStyle=none;exitX=1;exitY=0.5;entryX=0;html=1;") == "edgeStyle=none;html=1;"
+    assert c4izr.filter_string("entryX=0;rounded=0") == "rounded=0;"
+    assert c4izr.filter_string("html=1;exitX=1") == "html=1;"
+
+    print("Style filtering test passed!")
+    return True
+
+
 def test_file_processing():
     """Test processing an actual .drawio file structure in a temp directory."""
     print("Testing file processing...")
@@ -158,6 +205,175 @@ def test_file_processing():
         shutil.rmtree(temp_dir)
 
 
+def test_diagram_to_drawio():
+    """Test conversion of vision-style diagram data to draw.io XML."""
+    print("Testing diagram data to draw.io conversion...")
+
+    from png2drawio import DiagramToDrawIO
+
+    diagram_data = {
+        "elements": [
+            {"id": "elem_1", "type": "database", "label": "Orders <DB> & Co", "description": "Stores orders",
+             "position": {"x": 0.5, "y": 200}, "size": {"width": 80, "height": 90}, "style_hints": "Blue cylinder"},
+            {"id": "elem_2", "label": "API"},
+        ],
+        "connections": [
+            {"id": "conn_1", "source": "elem_2", "target": "elem_1", "label": "reads", "type": "dashed"},
+            {"id": "conn_2", "source": "elem_2", "target": "missing"},
+        ],
+    }
+
+    root = ET.fromstring(DiagramToDrawIO().convert(diagram_data))
+    cells = root.findall("root/mxCell")
+    vertices = [cell for cell in cells if cell.get("vertex") == "1"]
+    edges = [cell for cell in cells if cell.get("edge") == "1"]
+
+    assert len(vertices) == 2, "Both elements should become vertices"
+    assert len(edges) == 1, "Connections with unknown endpoints should be skipped"
+    assert vertices[0].get("value") == "Orders <DB> & Co\nStores orders", "Labels should survive escaping"
+    assert "shape=cylinder3" in vertices[0].get("style"), "Databases should use the cylinder shape"
+    assert "fillColor=#dae8fc" in vertices[0].get("style"), "Colour hints should be applied"
+    assert vertices[0].find("mxGeometry").get("x") == "800.0", "Relative positions should be scaled to the canvas"
+    assert edges[0].get("source") == vertices[1].get("id"), "Edge source should map to the draw.io ID"
+    assert edges[0].get("target") == vertices[0].get("id"), "Edge target should map to the draw.io ID"
+    assert "dashed=1" in edges[0].get("style"), "Dashed connections should be dashed"
+
+    print("Diagram data conversion test passed!")
+    return True
+
+
+def test_id_generator():
+    """Test that generated IDs have the requested length and use the ID alphabet."""
+    print("Testing ID generation...")
+
+    allowed = set(string.ascii_uppercase + string.digits + string.ascii_lowercase + '-_')
+    ids = [drawio_utils.id_generator() for _ in range(100)]
+
+    assert all(len(i) == 22 for i in ids), "Default IDs should be 22 characters long"
+    assert all(set(i) <= allowed for i in ids), "IDs should only use the ID alphabet"
+    assert len(set(ids)) == len(ids), "IDs should not repeat"
+    assert len(drawio_utils.id_generator(20)) == 20, "Custom size should be honoured"
+    assert set(drawio_utils.id_generator(50, chars="ab")) <= {"a", "b"}, "Custom alphabet should be honoured"
+
+    print("ID generation test passed!")
+    return True
+
+
+_SIMPLE_DRAWIO = '''<mxfile>
+  <diagram name="Page-1">
+    <mxGraphModel>
+      <root>
+        <mxCell id="0" />
+        <mxCell id="1" parent="0" />
+        <mxCell id="2" value="Test System" style="rounded=0;whiteSpace=wrap;html=1;" parent="1" vertex="1">
+          <mxGeometry x="260" y="170" width="120" height="60" as="geometry" />
+        </mxCell>
+      </root>
+    </mxGraphModel>
+  </diagram>
+</mxfile>'''
+
+
+def test_translation_cache():
+    """Test that the runner's translation cache hits, misses and drops bad or stale entries."""
+    print("Testing translation cache...")
+
+    import runner
+
+    temp_dir = tempfile.mkdtemp()
+    original_cache_dir = runner.TRANSLATION_CACHE_DIR
+    original_version = runner.TRANSLATION_CACHE_VERSION
+    runner.TRANSLATION_CACHE_DIR = os.path.join(temp_dir, "cache")
+    try:
+        test_file = os.path.join(temp_dir, "test.drawio")
+        with open(test_file, "w") as f:
+            f.write(_SIMPLE_DRAWIO)
+        with open(test_file, "rb") as f:
+            cache_path = runner._cache_path(f.read())
+
+        # Miss: the translation is stored
+        output_xml = runner.do_process(test_file, interactive=False)
+        assert "c4Name" in output_xml, "Output should be translated"
+        with open(cache_path, encoding="utf-8") as f:
+            assert f.read() == output_xml, "A miss should store the translation"
+
+        # Hit: the stored entry is served as is
+        cached_xml = '<mxGraphModel><root><mxCell id="cached"/></root></mxGraphModel>'
+        with open(cache_path, "w", encoding="utf-8") as f:
+            f.write(cached_xml)
+        assert runner.do_process(test_file, interactive=False) == cached_xml, "A hit should return the entry"
+        assert runner.do_process(test_file, interactive=False, use_cache=False) == output_xml, \
+            "Disabling the cache should translate afresh"
+
+        # Corrupt entries are replaced by a fresh translation
+        for corrupt in (b"garbage", b"\xff\xfe<mxGraphModel/>"):
+            with open(cache_path, "wb") as f:
+                f.write(corrupt)
+            assert runner.do_process(test_file, interactive=False) == output_xml, "Bad entries should be ignored"
+            with open(cache_path, encoding="utf-8") as f:
+                assert f.read() == output_xml, "Bad entries should be rewritten"
+
+        # A new translator version uses new entries
+        runner.TRANSLATION_CACHE_VERSION = original_version + "-test"
+        runner._translator_fingerprint.cache_clear()
+        with open(test_file, "rb") as f:
+            assert runner._cache_path(f.read()) != cache_path, "A new version should change the cache key"
+
+        print("Translation cache test passed!")
+        return True
+    finally:
+        runner.TRANSLATION_CACHE_DIR = original_cache_dir
+        runner.TRANSLATION_CACHE_VERSION = original_version
+        runner._translator_fingerprint.cache_clear()
+        shutil.rmtree(temp_dir)
+
+
+def test_runner_batch():
+    """Test that a batch directory run converts good files and reports broken ones."""
+    print("Testing runner batch mode...")
+
+    import runner
+
+    temp_dir = tempfile.mkdtemp()
+    diagrams_dir = os.path.join(temp_dir, "diagrams")
+    cache_dir = os.path.join(temp_dir, "cache")
+    original_output_dir = runner.BATCH_OUTPUT_DIR
+    original_cache_dir = runner.TRANSLATION_CACHE_DIR
+    original_env = os.environ.get("C4IZR_CACHE_DIR")
+    # Set both ways so workers see the cache whether they are forked or spawned
+    runner.BATCH_OUTPUT_DIR = os.path.join(temp_dir, "c4_output")
+    runner.TRANSLATION_CACHE_DIR = os.environ["C4IZR_CACHE_DIR"] = cache_dir
+    try:
+        os.makedirs(os.path.join(diagrams_dir, "sub"))
+        with open(os.path.join(diagrams_dir, "sub", "good.drawio"), "w") as f:
+            f.write(_SIMPLE_DRAWIO)
+        with open(os.path.join(diagrams_dir, "broken.drawio"), "w") as f:
+            f.write("<mxfile><diagram>")
+
+        # The second run is served from the cache the first one filled
+        for _ in range(2):
+            runner.process_directory(diagrams_dir, batch=True, use_cache=True)
+
+            # Output paths prefix the path relative to the input directory
+            good_output = os.path.join(runner.BATCH_OUTPUT_DIR, "c4_sub", "good.drawio")
+            assert os.path.isfile(good_output), "Good files should be converted"
+            assert "c4Name" in runner.drawio_xml(good_output, interactive=False), "Output should be translated"
+            assert not os.path.exists(os.path.join(runner.BATCH_OUTPUT_DIR, "c4_broken.drawio")), \
+                "Broken files should not produce output"
+            assert len(os.listdir(cache_dir)) == 1, "Only the good file should be cached"
+
+        print("Runner batch test passed!")
+        return True
+    finally:
+        runner.BATCH_OUTPUT_DIR = original_output_dir
+        runner.TRANSLATION_CACHE_DIR = original_cache_dir
+        if original_env is None:
+            os.environ.pop("C4IZR_CACHE_DIR", None)
+        else:
+            os.environ["C4IZR_CACHE_DIR"] = original_env
+        shutil.rmtree(temp_dir)
+
+
 def test_command_line():
     """Test command line argument parsing (simulated)."""
     print("Testing command line argument parsing...")
@@ -183,7 +399,13 @@ def run_all_tests():
     tests = [
         test_conversion_drawio,
         test_basic_conversion,
+        test_geometry_scaling,
+        test_filter_string,
         test_file_processing,
+        test_diagram_to_drawio,
+        test_id_generator,
+        test_translation_cache,
+        test_runner_batch,
         test_command_line
     ]
 
@@ -4,13 +4,134 @@ Vision-based diagram parser using Anthropic's Claude Opus with vision capabiliti
 Extracts structured diagram information from PNG/JPG images.
 """
 
+import asyncio
 import base64
+import functools
+import hashlib
 import json
 import os
+import re
+import tempfile
 from pathlib import Path
+from types import MappingProxyType
 from typing import Dict, List, Optional
 import anthropic
 
+try:
+    # Optional faster JSON implementation; the stdlib json module is used without it
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Optional markdown code fence around a JSON response; always matches, with
+# the payload in group 1 and surrounding whitespace and fences excluded
+_FENCE_RE = re.compile(r'^\s*(?:```(?:json)?)?\s*(.*?)\s*(?:```)?\s*$', re.DOTALL)
+
+# Media type sent to the API for each supported image extension
+_MEDIA_TYPES = MappingProxyType({
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+})
+
+# Instructions sent alongside every image
+_DIAGRAM_PROMPT = """Analyze this architecture/system diagram and extract all elements in a structured format.
+
+Please provide a JSON response with the following structure:
+
+{
+  "elements": [
+    {
+      "id": "unique_id",
+      "type": "box|cylinder|person|cloud|database|other",
+      "label": "element label/name",
+      "description": "any additional text or description",
+      "position": {"x": estimated_x, "y": estimated_y},
+      "size": {"width": estimated_width, "height": estimated_height},
+      "style_hints": "any visual styling cues (color, shape, icons, etc.)"
+    }
+  ],
+  "connections": [
+    {
+      "id": "unique_id",
+      "source": "source_element_id",
+      "target": "target_element_id",
+      "label": "connection label/description",
+      "type": "arrow|bidirectional|dashed|other",
+      "direction": "left-to-right|top-to-bottom|etc"
+    }
+  ],
+  "metadata": {
+    "diagram_type": "C4|UML|flowchart|network|other",
+    "title": "diagram title if present",
+    "layers": "description of any grouping/layers",
+    "notes": "any other relevant information"
+  }
+}
+
+Guidelines:
+1. Assign each box/shape a unique ID (e.g., "elem_1", "elem_2")
+2. Estimate positions relative to the diagram (0,0 is top-left)
+3. Identify element types based on visual appearance:
+   - Person icons/stick figures → "person"
+   - Cylindrical shapes → "database" or "cylinder"
+   - Cloud shapes → "cloud"
+   - Regular rectangles → "box"
+4. Extract ALL visible text labels
+5. Identify all arrows/connections between elements
+6. Note any grouping, boundaries, or swim lanes in metadata
+7. Preserve the spatial layout as accurately as possible
+
+Return ONLY the JSON, no additional text."""
+
+# Response size limit for one diagram analysis
+_MAX_TOKENS = 4096
+
+# Parsed results are memoized here, keyed by image content and model
+VISION_CACHE_DIR = Path.home() / ".cache" / "c4izr" / "vision"
+
+# Bump when the way responses are turned into results changes
+VISION_CACHE_VERSION = "1"
+
+# Everything besides the image and model that shapes a result; part of every
+# cache key, so editing the prompt or limits stops serving old results
+_CACHE_FINGERPRINT = hashlib.sha256(
+    f"{VISION_CACHE_VERSION}\0{_MAX_TOKENS}\0{_DIAGRAM_PROMPT}".encode("utf-8")
+).digest()
+
+
+@functools.lru_cache(maxsize=4)
+def _get_client(api_key: str, base_url: Optional[str]) -> anthropic.Anthropic:
+    """
+    Return a shared client for this key and endpoint.
+
+    Parsers created for the same settings reuse one client, and with it one
+    HTTP connection pool, instead of repeating connection and TLS setup.
+    """
+    # Create client with custom base URL if using copilot-api proxy
+    client_kwargs = {"api_key": api_key}
+    if base_url:
+        client_kwargs["base_url"] = base_url
+
+    return anthropic.Anthropic(**client_kwargs)
+
+
+def _new_async_client(api_key: str, base_url: Optional[str]) -> anthropic.AsyncAnthropic:
+    """
+    Create an async client.
+
+    Unlike sync clients these are not shared: their connection pool is bound
+    to the event loop they are used in, so callers close them within it.
+    """
+    client_kwargs = {"api_key": api_key}
+    if base_url:
+        client_kwargs["base_url"] = base_url
+
+    return anthropic.AsyncAnthropic(**client_kwargs)
+
 
 class VisionDiagramParser:
     """Parse diagram images using Claude's vision capabilities."""
@@ -29,20 +150,18 @@ class VisionDiagramParser:
         self.base_url = base_url or os.environ.get("ANTHROPIC_BASE_URL")
         self.api_key = api_key or os.environ.get("ANTHROPIC_API_KEY", "dummy")
 
-        # Create client with custom base URL if using copilot-api proxy
-        client_kwargs = {"api_key": self.api_key}
-        if self.base_url:
-            client_kwargs["base_url"] = self.base_url
+        self.client = _get_client(self.api_key, self.base_url)
 
-        self.client = anthropic.Anthropic(**client_kwargs)
-
-    def parse_diagram(self, image_path: str, model: str = "claude-opus-4-5-20251101") -> Dict:
+    def parse_diagram(self, image_path: str, model: str = "claude-opus-4-5-20251101",
+                      use_cache: bool = True) -> Dict:
         """
         Parse a diagram image and extract structured information.
 
         Args:
             image_path: Path to the diagram image (PNG, JPG, etc.)
             model: Claude model to use (default: opus-4.5)
+            use_cache: Reuse the stored result for an identical image and model
+                       instead of calling the API again
 
         Returns:
             Dictionary containing:
@@ -50,6 +169,72 @@ class VisionDiagramParser:
                 - connections: List of arrows/edges with labels
                 - metadata: Additional diagram information
         """
+        cache_path = self._cache_path(image_path, model) if use_cache else None
+        if cache_path and cache_path.is_file():
+            with open(cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+
+        # Call Claude with vision
+        message = self.client.messages.create(**self._build_request(image_path, model))
+
+        return self._handle_response(message, cache_path)
+
+    async def parse_diagram_async(self, image_path: str, model: str = "claude-opus-4-5-20251101",
+                                  use_cache: bool = True,
+                                  client: Optional[anthropic.AsyncAnthropic] = None) -> Dict:
+        """
+        Asynchronous version of parse_diagram, sharing its cache.
+
+        Args:
+            client: AsyncAnthropic client to send the request with, so many
+                    requests can share one connection pool. If None, a client
+                    is created and closed for this call.
+        """
+        cache_path = self._cache_path(image_path, model) if use_cache else None
+        if cache_path and cache_path.is_file():
+            with open(cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+
+        if client is None:
+            async with _new_async_client(self.api_key, self.base_url) as client:
+                return await self.parse_diagram_async(image_path, model=model, use_cache=use_cache,
+                                                      client=client)
+
+        # Call Claude with vision
+        message = await client.messages.create(**self._build_request(image_path, model))
+
+        return self._handle_response(message, cache_path)
+
+    async def parse_many(self, image_paths: List[str], model: str = "claude-opus-4-5-20251101",
+                         concurrency: int = 8, use_cache: bool = True) -> List[Dict]:
+        """
+        Parse several diagram images concurrently.
+
+        Args:
+            image_paths: Paths to the diagram images
+            model: Claude model to use (default: opus-4.5)
+            concurrency: Maximum number of requests in flight, to stay within rate limits
+            use_cache: Passed on to parse_diagram_async
+
+        Returns:
+            The parsed diagram data for each image, in the order given; an image
+            that could not be parsed has the exception raised for it instead,
+            so one failure does not cancel the rest of the batch
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        # One client for the whole batch, closed before this event loop ends
+        async with _new_async_client(self.api_key, self.base_url) as client:
+            async def parse_one(image_path):
+                async with semaphore:
+                    return await self.parse_diagram_async(image_path, model=model, use_cache=use_cache,
+                                                          client=client)
+
+            return await asyncio.gather(*(parse_one(image_path) for image_path in image_paths),
+                                        return_exceptions=True)
+
+    def _build_request(self, image_path: str, model: str) -> Dict:
+        """Build the messages.create arguments for analyzing one image."""
         # Read and encode image
         image_data = self._encode_image(image_path)
         media_type = self._get_media_type(image_path)
@@ -57,11 +242,10 @@ class VisionDiagramParser:
         # Create the prompt for diagram analysis
         prompt = self._create_diagram_analysis_prompt()
 
-        # Call Claude with vision
-        message = self.client.messages.create(
-            model=model,
-            max_tokens=4096,
-            messages=[
+        return {
+            "model": model,
+            "max_tokens": _MAX_TOKENS,
+            "messages": [
                 {
                     "role": "user",
                     "content": [
@@ -80,16 +264,46 @@ class VisionDiagramParser:
                     ],
                 }
             ],
-        )
+        }
 
+    def _handle_response(self, message, cache_path: Optional[Path]) -> Dict:
+        """Extract the diagram data from an API response and cache it if requested."""
         # Extract JSON response
         response_text = message.content[0].text
 
         # Parse JSON from response (may be wrapped in markdown code blocks)
         diagram_data = self._extract_json(response_text)
 
+        if cache_path:
+            self._write_cache(cache_path, diagram_data)
+
         return diagram_data
 
+    def _cache_path(self, image_path: str, model: str) -> Path:
+        """Return the cache file for an image analyzed with the given model."""
+        return VISION_CACHE_DIR / f"{self._cache_key(image_path, model)}.json"
+
+    def _cache_key(self, image_path: str, model: str) -> str:
+        """Hash the image bytes together with the model name and the request fingerprint."""
+        digest = hashlib.sha256()
+        with open(image_path, "rb") as image_file:
+            for chunk in iter(lambda: image_file.read(1 << 16), b""):
+                digest.update(chunk)
+        digest.update(model.encode("utf-8"))
+        digest.update(_CACHE_FINGERPRINT)
+        return digest.hexdigest()
+
+    def _write_cache(self, cache_path: Path, diagram_data: Dict) -> None:
+        """Store a parsed result atomically; failing to cache never fails the parse."""
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile("w", dir=cache_path.parent, suffix=".tmp",
+                                             delete=False, encoding="utf-8") as f:
+                json.dump(diagram_data, f)
+            os.replace(f.name, cache_path)
+        except OSError:
+            pass
+
     def _encode_image(self, image_path: str) -> str:
         """Encode image file to base64."""
         with open(image_path, "rb") as image_file:
@@ -98,80 +312,20 @@ class VisionDiagramParser:
     def _get_media_type(self, image_path: str) -> str:
         """Determine media type from file extension."""
         ext = Path(image_path).suffix.lower()
-        media_types = {
-            '.png': 'image/png',
-            '.jpg': 'image/jpeg',
-            '.jpeg': 'image/jpeg',
-            '.gif': 'image/gif',
-            '.webp': 'image/webp'
-        }
-        return media_types.get(ext, 'image/png')
+        return _MEDIA_TYPES.get(ext, 'image/png')
 
     def _create_diagram_analysis_prompt(self) -> str:
         """Create the prompt for diagram analysis."""
-        return """Analyze this architecture/system diagram and extract all elements in a structured format.
-
-Please provide a JSON response with the following structure:
-
-{
-  "elements": [
-    {
-      "id": "unique_id",
-      "type": "box|cylinder|person|cloud|database|other",
-      "label": "element label/name",
-      "description": "any additional text or description",
-      "position": {"x": estimated_x, "y": estimated_y},
-      "size": {"width": estimated_width, "height": estimated_height},
-      "style_hints": "any visual styling cues (color, shape, icons, etc.)"
-    }
-  ],
-  "connections": [
-    {
-      "id": "unique_id",
-      "source": "source_element_id",
-      "target": "target_element_id",
-      "label": "connection label/description",
-      "type": "arrow|bidirectional|dashed|other",
-      "direction": "left-to-right|top-to-bottom|etc"
-    }
-  ],
-  "metadata": {
-    "diagram_type": "C4|UML|flowchart|network|other",
-    "title": "diagram title if present",
-    "layers": "description of any grouping/layers",
-    "notes": "any other relevant information"
-  }
-}
-
-Guidelines:
-1. Assign each box/shape a unique ID (e.g., "elem_1", "elem_2")
-2. Estimate positions relative to the diagram (0,0 is top-left)
-3. Identify element types based on visual appearance:
-   - Person icons/stick figures → "person"
-   - Cylindrical shapes → "database" or "cylinder"
-   - Cloud shapes → "cloud"
-   - Regular rectangles → "box"
-4. Extract ALL visible text labels
-5. Identify all arrows/connections between elements
-6. Note any grouping, boundaries, or swim lanes in metadata
-7. Preserve the spatial layout as accurately as possible
-
-Return ONLY the JSON, no additional text."""
+        return _DIAGRAM_PROMPT
 
     def _extract_json(self, text: str) -> Dict:
         """Extract JSON from response text (handles markdown code blocks)."""
         # Remove markdown code blocks if present
-        text = text.strip()
-        if text.startswith("```json"):
-            text = text[7:]
-        elif text.startswith("```"):
-            text = text[3:]
-        if text.endswith("```"):
-            text = text[:-3]
-
-        text = text.strip()
+        text = _FENCE_RE.match(text).group(1)
 
         try:
+            if orjson is not None:
+                return orjson.loads(text)
             return json.loads(text)
         except json.JSONDecodeError as e:
             raise ValueError(f"Failed to parse JSON response: {e}\nResponse: {text}")
@@ -182,22 +336,34 @@ def main():
     import sys
 
     if len(sys.argv) < 2:
-        print("Usage: python vision_diagram_parser.py <image_path>")
+        print("Usage: python vision_diagram_parser.py <image_path> [<image_path> ...]")
         sys.exit(1)
 
-    image_path = sys.argv[1]
+    image_paths = sys.argv[1:]
 
-    # Parse diagram
+    # Parse diagrams, concurrently when there are several
     parser = VisionDiagramParser()
-    print(f"Analyzing diagram: {image_path}")
+    print(f"Analyzing {len(image_paths)} diagram(s): {', '.join(image_paths)}")
+
+    results = asyncio.run(parser.parse_many(image_paths))
+
+    for image_path, result in zip(image_paths, results):
+        if isinstance(result, BaseException):
+            print(f"\nError analyzing {image_path}: {result}")
+        else:
+            print_results(image_path, result)
 
-    result = parser.parse_diagram(image_path)
 
+def print_results(image_path: str, result: Dict):
+    """Print the analysis of one diagram."""
     # Pretty print results
     print("\n" + "="*80)
-    print("DIAGRAM ANALYSIS RESULTS")
+    print(f"DIAGRAM ANALYSIS RESULTS: {image_path}")
     print("="*80)
-    print(json.dumps(result, indent=2))
+    if orjson is not None:
+        print(orjson.dumps(result, option=orjson.OPT_INDENT_2).decode("utf-8"))
+    else:
+        print(json.dumps(result, indent=2))
 
     # Summary
     print("\n" + "="*80)